@@ -1,8 +1,25 @@
 """XLLM - Large Language Model with X-Embeddings feature."""
 
+import importlib
+
 __version__ = "0.1.0"
 
 __all__ = ["XLLM", "XLLMShort"]
 
-from xllm.xllm import XLLM
-from xllm.xllm_short import XLLMShort 
\ No newline at end of file
+# public name -> submodule defining it, imported on first access (PEP 562)
+_LAZY_ATTRIBUTES = {
+    "XLLM": ".xllm",
+    "XLLMShort": ".xllm_short",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,124 @@
+"""Command line interface for XLLM: python -m xllm <command> [options].
+
+Each command imports the modules it needs when it runs, so `--help` and
+one-shot commands only pay for what they use.
+"""
+
+import argparse
+import sys
+
+from . import xllm_util as llm
+
+
+def spell(args):
+    from .spelling import SpellingIndex
+
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=args.path)
+    stopwords = llm.read_stopwords("stopwords.txt", path=args.path)
+    print(SpellingIndex(dictionary).correct_query(" ".join(args.words), stopwords))
+
+
+def expand(args):
+    from .multitoken import MultitokenIndex
+
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=args.path)
+    ngrams_table = llm.read_table("xllm_compressed_ngrams_table.txt", type="list", path=args.path)
+    index = MultitokenIndex(dictionary, ngrams_table)
+    for key, words in index.lookup(args.words, max_tokens=args.max_tokens).items():
+        print(key + "\t" + ", ".join(words))
+
+
+def related(args):
+    from .related_words import load_related_words
+
+    graph = load_related_words(path=args.path, cache=args.cache, weighting=args.weighting)
+    for word, hop, weight in graph.expand(args.words, hops=args.hops, top_n=args.top_n):
+        print("%d %8.3f  %s" % (hop, weight, word))
+
+
+def publish(args):
+    from .table_store import compile_xllm_tables, publish_tables
+
+    publish_tables(compile_xllm_tables(args.path), args.output)
+    print("tables from %s published to %s" % (args.path, args.output))
+
+
+def compress(args):
+    from .table_compression import compress_directory
+
+    sizes = compress_directory(args.path, args.codec, args.level, remove=args.remove)
+    raw = sum(size for size, _ in sizes.values())
+    compressed = sum(size for _, size in sizes.values())
+    print("%d tables: %d -> %d bytes" % (len(sizes), raw, compressed))
+
+
+def query(args):
+    from .enterprise.backend import attach_backend_tables, load_backend_tables_from_disk
+    from .enterprise.processor import process_query
+
+    if args.store is not None:
+        backendTables = attach_backend_tables(args.store)
+    else:
+        backendTables = load_backend_tables_from_disk(args.path)
+    for entity_ID, score in process_query(" ".join(args.words), backendTables):
+        print("%8.3f  %s  %s" % (score, entity_ID, backendTables["ID_to_content"][entity_ID]))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="xllm", description="XLLM command line tools.")
+    subparsers = parser.add_subparsers(title="commands")
+
+    command = subparsers.add_parser("spell", help="correct the spelling of query words")
+    command.add_argument("words", nargs="+")
+    command.add_argument("--path", default=llm.DATA_PATH, help="table directory or URL")
+    command.set_defaults(func=spell)
+
+    command = subparsers.add_parser("expand", help="dictionary words made of query tokens")
+    command.add_argument("words", nargs="+")
+    command.add_argument("--path", default=llm.DATA_PATH, help="table directory or URL")
+    command.add_argument("--max-tokens", type=int, default=4, help="maximum tokens per word")
+    command.set_defaults(func=expand)
+
+    command = subparsers.add_parser("related", help="related words of query words, k hops away")
+    command.add_argument("words", nargs="+")
+    command.add_argument("--path", default=llm.DATA_PATH, help="table directory or URL")
+    command.add_argument(
+        "--cache", default="xllm_related_words.bin", help="related-words cache file"
+    )
+    command.add_argument("--weighting", choices=("count", "pmi"), default="count")
+    command.add_argument("--hops", type=int, default=1, help="expansion depth")
+    command.add_argument("--top-n", type=int, default=5, help="neighbors followed per word")
+    command.set_defaults(func=related)
+
+    command = subparsers.add_parser("publish", help="compile tables into a shared table store")
+    command.add_argument("--path", default=llm.DATA_PATH, help="table directory or URL")
+    command.add_argument("--output", default="xllm_tables.bin", help="table store file")
+    command.set_defaults(func=publish)
+
+    command = subparsers.add_parser("compress", help="compress the tables of a directory")
+    command.add_argument("--path", default=llm.DATA_PATH, help="table directory")
+    command.add_argument("--codec", choices=("gzip", "zstd"), default="gzip")
+    command.add_argument("--level", type=int, help="compression level")
+    command.add_argument("--remove", action="store_true", help="delete the text tables")
+    command.set_defaults(func=compress)
+
+    command = subparsers.add_parser("query", help="one-shot enterprise query")
+    command.add_argument("words", nargs="+")
+    command.add_argument("--path", default="", help="backend tables directory")
+    command.add_argument("--store", help="table store file from publish_backend_tables()")
+    command.set_defaults(func=query)
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if not hasattr(args, "func"):
+        parser.print_help()
+        return 1
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
 # reallocate.py: vincentg@mltechniques.com
 # see step 3 in project 8.2 in Projects4.pdf [download at https://mltblog.com/49w9omx]
 
+# Needs the xllm package (posting lists, category tree): pip install -e . at the
+# repository root, or run with PYTHONPATH=<repository>/src
+
 import requests # type: ignore
+from xllm.category_tree import CategoryTree
+from xllm.posting_lists import read_url_map
 
 # ---[1] Functions to read the input tables (copied from xllm_util.py)
 
@@ -93,8 +98,10 @@ repository = "https://raw.githubusercontent.com/VincentGranville/"
 path1 = path2 = path3 = ""
 
 arr_url = read_arr_url("xllm_arr_url.txt", path=path1)
-url_map = read_table("xllm_url_map.txt", type="hash", path=path1)
+url_map = read_url_map("xllm_url_map.txt", path=path1)  # word -> sorted url_IDs, counts
 assignedCategories = read_table("xllm_assignedCategories.txt", type="list", path=path3)
+hash_category = read_table("xllm_hash_category.txt", type="hash", path=path1)
+category_tree = CategoryTree.from_hash_category(hash_category)  # parsed once
 
 wolframCategories = {}
 data = get_data("list_final_URLs_stats.txt", path2)
@@ -113,6 +120,7 @@ for line in data:
 
 url_category_hash = {}  # auxiliary hash table
 mode = "depth"  # options: 'depth' or 'relevancy'
+rollup_depth = None  # None: assigned categories; n: scores rolled up to depth n (0 = root)
 
 for word in url_map:
     if word in assignedCategories:
@@ -122,11 +130,9 @@ for word in url_map:
 
         if category_level != 0:  # that is, if a category is assigned to word
             category_relevancy = float(item[2])
-            url_hash = url_map[word]  # list or url_IDs that contain word
+            postings = url_map[word]  # url_IDs that contain word, with counts
 
-            for url_ID in url_hash:
-                word_count = int(url_hash[url_ID])
-                url_ID = int(url_ID)
+            for url_ID, word_count in postings:
                 if mode == "relevancy":
                     weight = word_count * category_relevancy
                 elif mode == "depth":
@@ -137,22 +143,11 @@ for word in url_map:
                 else:
                     url_category_hash[key] = weight
 
+# best category of every URL in one pass, rolled up to rollup_depth if set
+bestCategories = category_tree.get_best_categories(url_category_hash, depth=rollup_depth)
 detectedCategories = {}
-
-for key in url_category_hash:
-    url_ID = key[0]
-    url = arr_url[url_ID]
-    category = key[1]
-    weight = url_category_hash[key]
-
-    if url in detectedCategories:
-        item = detectedCategories[url]
-        old_weight = item[1]
-        if weight > old_weight:
-            # update detected category assigned to url
-            detectedCategories[url] = (category, weight)
-    else:
-        detectedCategories[url] = (category, weight)
+for url_ID in bestCategories:
+    detectedCategories[arr_url[url_ID]] = bestCategories[url_ID]
 
 
 # ---[4] Compare Wolfram categories with my content-based reallocation
@@ -166,12 +161,15 @@ for url in detectedCategories:
     detectedCategory = item[0]
     score = item[1]
     print("Detected category: %s (score = %5.2f)" % (detectedCategory, score))
-    print("Wolfram category : %s\n" % (wolframCategories[url]))
-    if detectedCategory == wolframCategories[url]:
+    wolframCategory = wolframCategories[url]
+    if rollup_depth is not None and wolframCategory in category_tree:
+        wolframCategory = category_tree.get_ancestor(wolframCategory, rollup_depth)
+    print("Wolfram category : %s\n" % (wolframCategory))
+    if detectedCategory == wolframCategory:
         match += 1
     OUT.write(url + "\n")
     OUT.write("Detected category: " + detectedCategory + " (score: " + str(score) + ")\n")
-    OUT.write("Wolfram  category: " + wolframCategories[url] + "\n\n")
+    OUT.write("Wolfram  category: " + wolframCategory + "\n\n")
 
 
 OUT.close()
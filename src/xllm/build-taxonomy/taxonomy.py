@@ -1,8 +1,14 @@
 """Build taxonomy from XLLM6 data."""
 
+# Needs the xllm package (explorer, category tree): pip install -e . at the
+# repository root, or run with PYTHONPATH=<repository>/src
+
 import requests
 import xllm_util as llm6
 
+from xllm.category_tree import CategoryTree
+from xllm.explorer import Explorer
+
 # Unlike xllm.py, xllm_short.py does not process the (huge) crawled data.
 # Instead, it uses the much smaller summary tables produced by xllm.py
 
@@ -258,115 +264,21 @@ else:
 
 # --- [3] Play with taxonomy tables to get insights and improve them
 
-topWords = dict(sorted(topWords.items(), key=lambda item: item[0]))
-
-
-def show_menu(n, dict_mode):
-    # option 'o' useful to check if topWordA, topWordB are connected or not
-    # option 'c' shows all topWordB connected to topWordA = topWord
-
-    print("Command line menu: \n")
-    print("<Enter>                 - exit")
-    print("h                       - help: show menu options")
-    print("a                       - show all top words")
-    print("ds                      - select short dictionary")
-    print("df                      - select full dictionary")
-    print("n integer               - display entries with count >= integer")
-    print("f string                - find string in dictionary")
-    print("g topWord               - print groupWords[topWord]")
-    print("c topWord               - print connectedByTopWord[topWord]")
-    print("l topWordA topWordB     - (topWordA, topWordB) connections count\n")
-    print("current settings: n = %3d, dictionary = %s" % (n, dict_mode))
-    print()
-    return ()
-
+# Commands are run by xllm.explorer.Explorer, which indexes the dictionary
+# keys (suffix array) and counts once, so 'f' and 'n' do not rescan the
+# dictionary. Call explorer.execute(command) to use it without input().
 
-topWords = dict(sorted(topWords.items(), key=lambda item: item[0]))
-
-dict_mode = "short"
-dict = smallDictionary
+explorer = Explorer(
+    dictionary, smallDictionary, topWords, wordGroups, connectedByTopWord, connectedTopWords
+)
 query = "o"
-n = 0  # return entries with count >= n
-show_menu(n, dict_mode)
+for line in explorer.menu():
+    print(line)
 
 while query != "":
     query = input("Enter command, ex: <c hypothesis> [h for help]: ")
-    queries = query.split(" ")
-    action = queries[0]
-    if len(queries) > 2:
-        queries[1] = queries[1] + " " + queries[2]
-
-    if action == "h":
-        show_menu(n, dict_mode)
-
-    elif action == "ds":
-        dict = smallDictionary
-        dict_mode = "short"
-
-    elif action == "df":
-        dict = dictionary
-        dict_mode = "full"
-
-    elif action == "a":
-        for topWord in topWords:
-            count = topWords[topWord]
-            print(count, topWord)
-        print()
-
-    elif action in ("f", "g", "c", "l", "n") and len(queries) > 1:
-        string = queries[1]
-
-        if action == "n":
-            n = int(string)
-
-        elif action == "f":
-            for word in dict:
-                count = dict[word]
-                if string in word and count >= n:
-                    print(count, string, word)
-            print()
-
-        elif action == "g":
-            topWord = string
-            if topWord in wordGroups:
-                hash = wordGroups[topWord]
-                countA = dictionary[topWord]
-                for word in hash:
-                    countB = dictionary[word]
-                    if countB >= n:
-                        print(countA, countB, topWord, word)
-            else:
-                print("topWord not in wordGroups")
-            print()
-
-        elif action == "c":
-            topWord = string
-            if topWord in connectedByTopWord:
-                hash = connectedByTopWord[topWord]
-                countA = dictionary[topWord]
-                for word in hash:
-                    countB = dictionary[word]
-                    countAB = hash[word]
-                    if countAB >= n:
-                        print(countA, countB, countAB, topWord, word)
-            else:
-                print("topWord not in wordGroups")
-            print()
-
-        elif action == "l":
-            astring = string.split(" ")
-            if len(astring) == 1:
-                print("needs 2 topWords, space-separated")
-            else:
-                key = (astring[0], astring[1])
-                if key in connectedTopWords:
-                    count = connectedTopWords[key]
-                else:
-                    count = 0
-                print(count, key)
-
-    elif action != "":
-        print("Missing arguments")
+    for line in explorer.execute(query):
+        print(line)
 
 print()
 
@@ -378,24 +290,6 @@ print()
 ## stem/plural
 
 
-def get_external_taxonomy(hash_category):
-    categories = {}
-    parent_categories = {}
-
-    for word in hash_category:
-        for category_item in hash_category[word]:
-            category_item = category_item.lower()
-            category_item = category_item.replace("  ", " ").split(" | ")
-            category1 = category_item[0].replace(" ", "~")
-            category2 = category_item[1].replace(" ", "~")
-            level1 = int(category_item[2])
-            level2 = level1 - 1
-            categories[category1] = level1
-            categories[category2] = level2
-            parent_categories[category1] = category2
-    return (categories, parent_categories)
-
-
 def compute_similarity(dictionary, word, category):
     tokensA = word.split("~")
     tokensB = category.split("~")
@@ -418,7 +312,9 @@ def compute_similarity(dictionary, word, category):
     return similarity
 
 
-categories, parent_categories = get_external_taxonomy(hash_category)
+# parsed once into a tree: node IDs, parent array, Euler-tour intervals
+category_tree = CategoryTree.from_hash_category(hash_category)
+categories = {name: level for name, level in zip(category_tree.names, category_tree.levels)}
 
 
 # --- Main loop
@@ -0,0 +1,185 @@
+"""Compiled category hierarchy from hash_category.
+
+hash_category attaches to each word entries 'Name | Parent | level' of an
+external taxonomy. The tree is built once from these strings:
+
+    names[node], node_IDs[name]   integer node IDs
+    parents[node]                 parent node ID, -1 for a root
+    depths[node]                  0 for a root
+    levels[node]                  level found in hash_category (as in categories)
+    tin[node], tout[node]         Euler-tour interval: node b is in the subtree
+                                  of a iff tin[a] <= tin[b] < tout[a]
+
+Ancestor lookup walks the parent array, subtree membership is two integer
+comparisons, and rolling scores up the hierarchy is one cumulative sum over
+the nodes in Euler-tour order: the total of a subtree is the sum of the
+contiguous slice [tin, tout). Scores are numpy arrays indexed by node ID,
+with one row per URL or word, so all rows are rolled up in one pass.
+get_best_categories() works on sparse {(url, category): score} pairs instead,
+and rolls each pair up to its ancestor at the requested depth.
+"""
+
+from array import array
+
+
+def parse_category_item(category_item):
+    """(name, parent, level) of a 'Name | Parent | level' string, names as in the dictionary."""
+    category_item = category_item.lower()
+    category_item = category_item.replace("  ", " ").split(" | ")
+    name = category_item[0].replace(" ", "~")
+    parent = category_item[1].replace(" ", "~")
+    return name, parent, int(category_item[2])
+
+
+def get_external_taxonomy(hash_category):
+    """Flat tables: categories = {name: level}, parent_categories = {name: parent}."""
+    categories = {}
+    parent_categories = {}
+    for word in hash_category:
+        for category_item in hash_category[word]:
+            name, parent, level = parse_category_item(category_item)
+            categories[name] = level
+            categories[parent] = level - 1
+            parent_categories[name] = parent
+    return categories, parent_categories
+
+
+class CategoryTree:
+    """Category hierarchy with integer node IDs, parent array and Euler-tour intervals."""
+
+    def __init__(self, categories, parent_categories):
+        self.names = list(categories)
+        self.node_IDs = {name: node for node, name in enumerate(self.names)}
+        n_nodes = len(self.names)
+        self.levels = array("i", [categories[name] for name in self.names])
+
+        # parent array; self-parents and edges closing a cycle make a root
+        self.parents = array("i", [-1] * n_nodes)
+        for name, parent in parent_categories.items():
+            if name != parent and name in self.node_IDs and parent in self.node_IDs:
+                node, parent_node = self.node_IDs[name], self.node_IDs[parent]
+                ancestor = parent_node
+                while ancestor != -1 and ancestor != node:
+                    ancestor = self.parents[ancestor]
+                if ancestor == -1:
+                    self.parents[node] = parent_node
+
+        children = [[] for _ in range(n_nodes)]
+        for node in range(n_nodes):
+            if self.parents[node] != -1:
+                children[self.parents[node]].append(node)
+
+        # iterative DFS: preorder positions (tin), end of subtree (tout), depths
+        self.depths = array("i", [0] * n_nodes)
+        self.tin = array("i", [0] * n_nodes)
+        self.tout = array("i", [0] * n_nodes)
+        self.order = array("i")  # node IDs in Euler-tour (preorder) order
+        for root in range(n_nodes):
+            if self.parents[root] != -1:
+                continue
+            stack = [(root, False)]
+            while stack:
+                node, done = stack.pop()
+                if done:
+                    self.tout[node] = len(self.order)
+                    continue
+                self.tin[node] = len(self.order)
+                self.order.append(node)
+                stack.append((node, True))
+                for child in reversed(children[node]):
+                    self.depths[child] = self.depths[node] + 1
+                    stack.append((child, False))
+
+    @classmethod
+    def from_hash_category(cls, hash_category):
+        """Build the tree from the hash_category table."""
+        return cls(*get_external_taxonomy(hash_category))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.node_IDs
+
+    def get_parent(self, name):
+        """Parent category of name, or None for a root."""
+        parent = self.parents[self.node_IDs[name]]
+        return self.names[parent] if parent != -1 else None
+
+    def get_ancestors(self, name):
+        """Categories from name up to its root, name included."""
+        node = self.node_IDs[name]
+        ancestors = []
+        while node != -1:
+            ancestors.append(self.names[node])
+            node = self.parents[node]
+        return ancestors
+
+    def get_ancestor(self, name, depth):
+        """Ancestor of name at the given depth (0 = root); name itself if it is not deeper."""
+        node = self.node_IDs[name]
+        while self.depths[node] > depth:
+            node = self.parents[node]
+        return self.names[node]
+
+    def is_in_subtree(self, name, ancestor):
+        """True if name is ancestor or one of its descendants."""
+        node, ancestor_node = self.node_IDs[name], self.node_IDs[ancestor]
+        return self.tin[ancestor_node] <= self.tin[node] < self.tout[ancestor_node]
+
+    def get_subtree(self, name):
+        """Categories in the subtree of name, in Euler-tour order."""
+        node = self.node_IDs[name]
+        return [self.names[k] for k in self.order[self.tin[node] : self.tout[node]]]
+
+    def rollup(self, scores):
+        """Subtree totals of node scores.
+
+        scores: numpy array with the node ID as last axis, e.g. (n_urls, n_nodes).
+        Returns an array of the same shape where each node holds the sum of the
+        scores of its subtree, itself included.
+        """
+        import numpy as np
+
+        scores = np.asarray(scores)
+        order = np.frombuffer(self.order, dtype=np.int32)
+        shape = scores.shape[:-1] + (len(self) + 1,)
+        cumulative = np.zeros(shape, dtype=np.result_type(scores, float))
+        np.cumsum(scores[..., order], axis=-1, out=cumulative[..., 1:])
+        tin = np.frombuffer(self.tin, dtype=np.int32)
+        tout = np.frombuffer(self.tout, dtype=np.int32)
+        return cumulative[..., tout] - cumulative[..., tin]
+
+    def get_best_categories(self, pair_scores, depth=None):
+        """Top category of each row key, at a given depth of the hierarchy.
+
+        pair_scores: {(row_key, category): score}, e.g. (url_ID, category) weights
+        depth: None to pick among the categories on their own score, or a depth
+            to pick among the categories at that depth, on the total score of
+            their subtree (categories missing from the tree, or less deep, are
+            then ignored)
+        Returns {row_key: (category, score)}, row keys in order of first
+        appearance. Scores stay sparse: memory is proportional to the number
+        of pairs. Ties go to the category seen first, as in reallocate.py.
+        """
+        if depth is None:
+            rolled = pair_scores
+        else:
+            rolled = {}  # (row_key, ancestor at depth): total score
+            ancestors = {}  # category -> its ancestor at depth, None if there is none
+            for (key, category), score in pair_scores.items():
+                if category not in ancestors:
+                    node = self.node_IDs.get(category)
+                    if node is None or self.depths[node] < depth:
+                        ancestors[category] = None
+                    else:
+                        ancestors[category] = self.get_ancestor(category, depth)
+                if ancestors[category] is not None:
+                    pair = (key, ancestors[category])
+                    rolled[pair] = rolled.get(pair, 0) + score
+
+        best = {}
+        for (key, category), score in rolled.items():
+            if key not in best or score > best[key][1]:
+                best[key] = (category, score)
+        return best
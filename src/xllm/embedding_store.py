@@ -0,0 +1,377 @@
+"""Compact storage for xllm_embeddings.txt: quantized, pruned, binary.
+
+The text table maps each word to a hash {token: weight} of float64 weights.
+Loaded as Python dicts, every entry costs a key, a float object and a hash
+slot. Here the rows are stored as CSR arrays:
+
+    offsets[k] : offsets[k + 1]   slice of word k in token_IDs and values
+    token_IDs                     uint16 (uint32 for large vocabularies)
+    values                        float32, float16, or int8 with a float32
+                                  scale per row (symmetric: weight = q * scale)
+
+Rows can be pruned to their top_k largest weights, or to weights >= threshold,
+before quantization. Nearest neighbors (cosine similarity of rows) are
+computed from a token -> rows inverted index, built on first use.
+
+evaluate() reports the memory saved and how well nearest-neighbor rankings
+survive quantization and pruning, compared with float64 embeddings.
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import tracemalloc
+from collections.abc import Mapping
+
+from . import xllm_util as llm
+
+MAGIC = b"XLLMEMB1"
+DTYPES = ("float64", "float32", "float16", "int8")
+
+
+def prune_row(hash, top_k=None, threshold=None):
+    """Entries of a row kept by pruning, largest weights first."""
+    items = sorted(hash.items(), key=lambda item: (-item[1], item[0]))
+    if threshold is not None:
+        items = [item for item in items if item[1] >= threshold]
+    if top_k is not None:
+        items = items[:top_k]
+    return items
+
+
+class EmbeddingStore(Mapping):
+    """Read-only {word: {token: weight}} backed by quantized CSR arrays."""
+
+    def __init__(self, words, tokens, offsets, token_IDs, values, scales=None, params=None):
+        self.words = words
+        self.tokens = tokens
+        self.word_IDs = {word: k for k, word in enumerate(words)}
+        self.offsets = offsets
+        self.token_IDs = token_IDs
+        self.values = values
+        self.scales = scales  # int8 only
+        self.params = params or {}
+        self._weights = None
+        self._norms = None
+        self._columns = None
+
+    def __getitem__(self, word):
+        k = self.word_IDs[word]
+        token_IDs, weights = self.get_row(k)
+        return {self.tokens[t]: float(w) for t, w in zip(token_IDs.tolist(), weights.tolist())}
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def get_row(self, k):
+        """Token IDs and weights of row k."""
+        start, end = self.offsets[k], self.offsets[k + 1]
+        return self.token_IDs[start:end], self.get_weights()[start:end]
+
+    def get_weights(self):
+        """All weights, dequantized to float32 or float64 (computed once)."""
+        import numpy as np
+
+        if self._weights is None:
+            weights = self.values.astype(np.result_type(self.values.dtype, np.float32))
+            if self.scales is not None:
+                row_lengths = np.diff(self.offsets)
+                weights *= np.repeat(self.scales, row_lengths)
+            self._weights = weights
+        return self._weights
+
+    def get_nbytes(self):
+        """Bytes used by the arrays."""
+        arrays = (self.offsets, self.token_IDs, self.values, self.scales)
+        return sum(values.nbytes for values in arrays if values is not None)
+
+    # --- nearest neighbors
+
+    def _build_columns(self):
+        """Inverted index token -> rows, and row norms."""
+        import numpy as np
+
+        weights = self.get_weights().astype(np.float64)
+        row_IDs = np.repeat(np.arange(len(self.words)), np.diff(self.offsets))
+        order = np.argsort(self.token_IDs, kind="stable")
+        column_offsets = np.zeros(len(self.tokens) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.token_IDs, minlength=len(self.tokens)), out=column_offsets[1:])
+        self._columns = (column_offsets, row_IDs[order], weights[order])
+        self._norms = np.sqrt(np.bincount(row_IDs, weights=weights**2, minlength=len(self.words)))
+
+    def similarities(self, word):
+        """Cosine similarity of word with every word, as an array indexed by word ID."""
+        import numpy as np
+
+        if self._columns is None:
+            self._build_columns()
+        column_offsets, row_IDs, weights = self._columns
+        k = self.word_IDs[word]
+        scores = np.zeros(len(self.words))
+        token_IDs, query_weights = self.get_row(k)
+        for t, w in zip(token_IDs.tolist(), query_weights.tolist()):
+            start, end = column_offsets[t], column_offsets[t + 1]
+            scores[row_IDs[start:end]] += w * weights[start:end]
+        norms = self._norms * self._norms[k]
+        return np.divide(scores, norms, out=np.zeros_like(scores), where=norms > 0)
+
+    def nearest(self, word, k=10):
+        """[(word, cosine similarity)] of the k nearest words, excluding word itself."""
+        import numpy as np
+
+        scores = self.similarities(word)
+        scores[self.word_IDs[word]] = -np.inf
+        candidates = np.flatnonzero(scores > 0)
+        best = sorted(candidates.tolist(), key=lambda row: (-scores[row], row))[:k]
+        return [(self.words[row], float(scores[row])) for row in best]
+
+    # --- binary file
+
+    def save(self, filename):
+        """Write the store to a binary file (or a writable binary file object)."""
+        header = {
+            "words": self.words,
+            "tokens": self.tokens,
+            "params": self.params,
+            "dtypes": [self.offsets.dtype.str, self.token_IDs.dtype.str, self.values.dtype.str],
+            "lengths": [len(self.offsets), len(self.token_IDs), len(self.values)],
+            "scales": self.scales is not None,
+        }
+        header = json.dumps(header).encode("utf-8")
+        OUT = open(filename, "wb") if isinstance(filename, str) else filename
+        try:
+            OUT.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for values in (self.offsets, self.token_IDs, self.values, self.scales):
+                if values is not None:
+                    OUT.write(values.tobytes())
+        finally:
+            if isinstance(filename, str):
+                OUT.close()
+
+    @classmethod
+    def load(cls, filename):
+        """Read a store written by save()."""
+        import numpy as np
+
+        with open(filename, "rb") as IN:
+            data = IN.read()
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not an embedding store" % filename)
+        position = len(MAGIC) + 8
+        header_size = int.from_bytes(data[len(MAGIC) : position], "little")
+        header = json.loads(data[position : position + header_size])
+        position += header_size
+        arrays = []
+        for dtype, length in zip(header["dtypes"], header["lengths"]):
+            values = np.frombuffer(data, dtype=dtype, count=length, offset=position)
+            position += values.nbytes
+            arrays.append(values)
+        scales = None
+        if header["scales"]:
+            scales = np.frombuffer(
+                data, dtype=np.float32, count=len(header["words"]), offset=position
+            )
+        return cls(
+            header["words"], header["tokens"], *arrays, scales=scales, params=header["params"]
+        )
+
+
+def compile_embeddings(embeddings, dtype="float16", top_k=None, threshold=None):
+    """EmbeddingStore from {word: {token: weight}}.
+
+    Args:
+        dtype: 'float64', 'float32', 'float16' or 'int8' (per-row scale)
+        top_k: keep the top_k largest weights of each row
+        threshold: keep weights >= threshold
+    """
+    import numpy as np
+
+    if dtype not in DTYPES:
+        raise ValueError("dtype must be one of %s" % (DTYPES,))
+    words = list(embeddings)
+    token_IDs = {}
+    offsets = [0]
+    row_token_IDs = []
+    row_values = []
+    for word in words:
+        for token, weight in prune_row(embeddings[word], top_k, threshold):
+            row_token_IDs.append(token_IDs.setdefault(token, len(token_IDs)))
+            row_values.append(weight)
+        offsets.append(len(row_values))
+
+    offsets = np.array(offsets, dtype=np.uint32)
+    values = np.array(row_values, dtype=np.float64)
+    scales = None
+    if dtype == "int8":
+        row_IDs = np.repeat(np.arange(len(words)), np.diff(offsets))
+        peaks = np.zeros(len(words))
+        np.maximum.at(peaks, row_IDs, np.abs(values))
+        scales = (peaks / 127).astype(np.float32)
+        scales[scales == 0] = 1
+        values = np.rint(values / scales[row_IDs]).astype(np.int8)
+    else:
+        values = values.astype(dtype)
+    index_dtype = np.uint16 if len(token_IDs) <= 1 << 16 else np.uint32
+    params = {"dtype": dtype, "top_k": top_k, "threshold": threshold}
+    return EmbeddingStore(
+        words,
+        list(token_IDs),
+        offsets,
+        np.array(row_token_IDs, dtype=index_dtype),
+        values,
+        scales,
+        params,
+    )
+
+
+def read_embeddings(filename="xllm_embeddings.txt", path=llm.DATA_PATH):
+    return llm.read_table(filename, type="hash", format="float", path=path)
+
+
+def get_dict_nbytes(filename="xllm_embeddings.txt", path=llm.DATA_PATH):
+    """Memory allocated by the embeddings loaded as Python dicts."""
+    tracemalloc.start()
+    embeddings = read_embeddings(filename, path)
+    nbytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del embeddings
+    return nbytes
+
+
+def get_ranks(values):
+    """Ranks of values, ties averaged (as in Spearman's rho)."""
+    import numpy as np
+
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values))
+    sorted_values = values[order]
+    start = 0
+    for end in range(1, len(values) + 1):
+        if end == len(values) or sorted_values[end] != sorted_values[start]:
+            ranks[order[start:end]] = (start + end - 1) / 2
+            start = end
+    return ranks
+
+
+def get_correlation(x, y):
+    """Pearson correlation of two arrays (nan if one of them is constant)."""
+    import numpy as np
+
+    x = x - x.mean()
+    y = y - y.mean()
+    norm = np.sqrt((x**2).sum() * (y**2).sum())
+    return float((x * y).sum() / norm) if norm > 0 else float("nan")
+
+
+def get_rank_correlation(x, y):
+    """Spearman rank correlation of two arrays (nan if one of them is constant)."""
+    return get_correlation(get_ranks(x), get_ranks(y))
+
+
+def evaluate(embeddings, configs, k=10, n_queries=500, seed=0, tolerance=1e-6):
+    """Compare compact stores with float64 embeddings.
+
+    For each config (keyword arguments of compile_embeddings) reports:
+        nbytes: bytes of the arrays; file_bytes: size of the binary file
+        entries: entries kept after pruning
+        rank_correlation: mean Spearman correlation between the float64 and
+            compact similarities of the k nearest float64 neighbors of a word
+        correlation: mean Pearson correlation of the same similarities
+        recall: mean fraction of the k nearest compact neighbors whose float64
+            similarity is within tolerance of the k-th float64 similarity, so
+            that neighbors tied with the k-th one count as hits whatever
+            order the ties are broken in
+    over n_queries words that have at least k neighbors.
+    """
+    import numpy as np
+
+    reference = compile_embeddings(embeddings, dtype="float64")
+    queries = []
+    for word in sorted(embeddings):
+        neighbors = reference.nearest(word, k)
+        if len(neighbors) == k:
+            queries.append((word, [reference.word_IDs[neighbor] for neighbor, _ in neighbors]))
+    queries = random.Random(seed).sample(queries, min(n_queries, len(queries)))
+
+    def mean(values):
+        return float(np.nanmean(values)) if queries else float("nan")
+
+    reports = []
+    for config in configs:
+        store = compile_embeddings(embeddings, **config)
+        buffer = io.BytesIO()
+        store.save(buffer)
+        rank_correlations = []
+        correlations = []
+        recalls = []
+        for word, neighbor_IDs in queries:
+            scores = reference.similarities(word)
+            exact = scores[neighbor_IDs]
+            approx = store.similarities(word)[neighbor_IDs]
+            rank_correlations.append(get_rank_correlation(exact, approx))
+            correlations.append(get_correlation(exact, approx))
+            found = [store.word_IDs[neighbor] for neighbor, _ in store.nearest(word, k)]
+            recalls.append(np.count_nonzero(scores[found] >= exact.min() - tolerance) / k)
+        report = dict(config)
+        report.update(
+            {
+                "nbytes": store.get_nbytes(),
+                "file_bytes": len(buffer.getvalue()),
+                "entries": len(store.values),
+                "rank_correlation": mean(rank_correlations),
+                "correlation": mean(correlations),
+                "recall": mean(recalls),
+            }
+        )
+        reports.append(report)
+    return reports
+
+
+CONFIGS = (
+    {"dtype": "float64"},
+    {"dtype": "float32"},
+    {"dtype": "float16"},
+    {"dtype": "int8"},
+    {"dtype": "float16", "top_k": 20},
+    {"dtype": "int8", "top_k": 20},
+    {"dtype": "int8", "threshold": 1.0},
+)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    embeddings = read_embeddings(path=path)
+    filename = llm.get_table_path("xllm_embeddings.txt", path) if "http" not in path else None
+    print(
+        "xllm_embeddings.txt: %d words, %d entries; %d bytes on disk, %d bytes as Python dicts"
+        % (
+            len(embeddings),
+            sum(len(hash) for hash in embeddings.values()),
+            os.path.getsize(filename) if filename is not None else 0,
+            get_dict_nbytes(path=path),
+        )
+    )
+    print(
+        "dtype    top_k threshold  entries   arrays (B)   file (B)  rank corr  "
+        "correlation  recall@10"
+    )
+    for report in evaluate(embeddings, CONFIGS):
+        print(
+            "%-8s %5s %9s %8d %12d %10d %10.4f %12.4f %10.4f"
+            % (
+                report["dtype"],
+                report.get("top_k", "-") or "-",
+                report.get("threshold", "-") or "-",
+                report["entries"],
+                report["nbytes"],
+                report["file_bytes"],
+                report["rank_correlation"],
+                report["correlation"],
+                report["recall"],
+            )
+        )
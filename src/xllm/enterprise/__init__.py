@@ -1,5 +1,32 @@
 """XLLM Enterprise module for corporate knowledge management."""
 
-from src.xllm.enterprise.config import get_backend_params, get_frontend_params
-from src.xllm.enterprise.backend import generate_backend_tables, load_backend_tables
-from src.xllm.enterprise.processor import process_query 
\ No newline at end of file
+import importlib
+
+__all__ = [
+    "get_backend_params",
+    "get_frontend_params",
+    "generate_backend_tables",
+    "load_backend_tables",
+    "process_query",
+]
+
+# public name -> submodule defining it, imported on first access (PEP 562)
+_LAZY_ATTRIBUTES = {
+    "get_backend_params": ".config",
+    "get_frontend_params": ".config",
+    "generate_backend_tables": ".backend",
+    "load_backend_tables": ".backend",
+    "process_query": ".processor",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,13 +1,647 @@
 """Backend processing for XLLM Enterprise."""
 
-from src.xllm.enterprise.config import (
+import ast
+import hashlib
+import os
+import pickle
+import re
+import time
+import zlib
+
+from .. import xllm_util as llm
+from ..table_store import attach_tables, publish_tables
+from .config import (
+    STOPWORDS,
+    TABLE_NAMES,
+    get_agents,
     get_backend_params,
-    get_frontend_params,
     get_tables_dict,
 )
-
-from src.xllm.enterprise.utils import (
+from .stemmer import CACHE_FILENAME, Stemmer, get_stem
+from .utils import (
+    get_value,
     update_hash,
     update_nested_hash,
-    get_value,
-) 
\ No newline at end of file
+)
+
+REPOSITORIES = ("repository.txt", "repository2.txt", "repository3.txt")
+
+# tables needed at query time, shared by query workers through a table store
+SHARED_TABLES = (
+    "dictionary",
+    "hash_context1",
+    "hash_stem",
+    "hash_unstem",
+    "ID_to_content",
+    "ID_to_agents",
+    "ID_size",
+)
+
+# table name: (key format, value format) in backend_<name>.txt
+TABLE_FORMATS = {
+    "dictionary": ("str", "int"),
+    "hash_pairs": ("list", "int"),
+    "hash_context1": ("str", "hash"),
+    "hash_stem": ("str", "str"),
+    "hash_unstem": ("str", "list"),
+    "token_count": ("str", "int"),
+    "ID_to_content": ("str", "str"),
+    "ID_to_agents": ("str", "list"),
+    "ID_size": ("str", "int"),
+    "ID_to_index": ("str", "index"),
+    "Index_to_IDs": ("index", "hash"),
+    "ID_to_duplicates": ("str", "list"),
+}
+
+
+# --- [1] Parse entities
+
+def parse_entity(line):
+    """Split a repository line 'entityID~~{field::value||...}' into (entityID, content)."""
+    entity = line.split("~~", 1)
+    if len(entity) < 2 or entity[1].strip() == "":
+        return None, ""
+    return entity[0].strip(), entity[1].strip()
+
+
+def get_fields(content):
+    """Map field name to text for an entity content '{title::...||description::...}'."""
+    fields = {}
+    if content.startswith("{") and content.endswith("}"):
+        content = content[1:-1]
+    for item in content.split("||"):
+        item = item.split("::", 1)
+        if len(item) == 2:
+            fields[item[0].strip()] = item[1]
+    return fields
+
+
+def get_doc(entity_ID):
+    """Document number of an entity: n in IDs ending with 'X<n>', otherwise 0."""
+    match = re.search(r"X(\d+)$", entity_ID)
+    return int(match.group(1)) if match else 0
+
+
+def get_runs(text, stopwords):
+    """Lowercase tokens of text, split into runs of consecutive non-stopwords."""
+    runs = []
+    run = []
+    for token in re.sub(r"[^a-z0-9\-]+", " ", text.lower()).split():
+        token = token.strip("-")
+        if token in stopwords or token == "":
+            if run:
+                runs.append(run)
+            run = []
+        else:
+            run.append(token)
+    if run:
+        runs.append(run)
+    return runs
+
+
+def get_contribution(entity_ID, content, backendParams, stopwords, stemmer=None):
+    """Everything that entity_ID adds to the backend tables.
+
+    Subtracting the same contribution removes the entity, which is what makes
+    incremental updates possible. Stems (use_stem) come from stemmer, a
+    Stemmer service, or from get_stem if it is None.
+    """
+    max_multitoken = backendParams["max_multitoken"]
+    maxDist = backendParams["maxDist"]
+    use_stem = backendParams["use_stem"]
+    stem = stemmer.stem if stemmer else get_stem
+    fields = get_fields(content)
+    words = {}
+    pairs = {}
+    tokens = {}
+    size = 0
+
+    for field in fields:
+        size += len(fields[field])
+        for run in get_runs(fields[field], stopwords):
+            if use_stem:
+                for token in run:
+                    update_hash(tokens, token)
+                run = [stem(token) for token in run]
+            for k in range(len(run)):
+                for n in range(1, max_multitoken + 1):
+                    if k + n <= len(run):
+                        update_hash(words, "~".join(run[k : k + n]))
+                if backendParams["create_hpairs"]:
+                    for j in range(k + 1, min(k + maxDist + 1, len(run))):
+                        if run[k] != run[j]:
+                            update_hash(pairs, tuple(sorted((run[k], run[j]))))
+
+    agents_map = get_agents()
+    agents = tuple(agents_map[word] for word in agents_map if word in words)
+    contribution = {
+        "content": content,
+        "title": get_value("title", fields),
+        "words": words,
+        "pairs": pairs,
+        "tokens": tokens,
+        "agents": agents,
+        "size": size,
+    }
+    return contribution
+
+
+# --- [2] Apply contributions to the backend tables
+
+def get_sections(backendTables):
+    """Map (doc, title) to its index in Index_to_IDs, from existing tables."""
+    sections = {}
+    ID_to_content = backendTables["ID_to_content"]
+    for entity_ID, index in backendTables["ID_to_index"].items():
+        title = get_value("title", get_fields(ID_to_content[entity_ID]))
+        sections[(index[0], title)] = index
+    return sections
+
+
+def add_stem(backendTables, token, stemmer=None):
+    stem = stemmer.stem(token) if stemmer else get_stem(token)
+    if stem != token:
+        backendTables["hash_stem"][token] = stem
+    unstem = backendTables["hash_unstem"].get(stem, ())
+    if token not in unstem:  # unless written back by Stemmer.write_tables
+        backendTables["hash_unstem"][stem] = (*unstem, token)
+
+
+def remove_stem(backendTables, token):
+    stem = backendTables["hash_stem"].pop(token, token)
+    unstem = tuple(item for item in backendTables["hash_unstem"][stem] if item != token)
+    if unstem:
+        backendTables["hash_unstem"][stem] = unstem
+    else:
+        del backendTables["hash_unstem"][stem]
+
+
+def apply_contribution(
+    backendTables, entity_ID, contribution, sections, sign, stemmer=None, changed_tables=None
+):
+    """Add (sign = 1) or subtract (sign = -1) the contribution of one entity.
+
+    changed_tables, if a set, collects the names of the tables that were modified.
+    """
+    dictionary = backendTables["dictionary"]
+    token_count = backendTables["token_count"]
+    names = ["ID_to_content", "ID_size", "ID_to_index", "Index_to_IDs", "ID_to_agents"]
+
+    if contribution["words"]:
+        names += ["dictionary", "hash_context1"]
+    for word, count in contribution["words"].items():
+        update_hash(dictionary, word, sign * count)
+        update_nested_hash(backendTables["hash_context1"], word, entity_ID, sign * count)
+    if contribution["pairs"]:
+        names.append("hash_pairs")
+    for pair, count in contribution["pairs"].items():
+        update_hash(backendTables["hash_pairs"], pair, sign * count)
+    if contribution["tokens"]:
+        names.append("token_count")
+    for token, count in contribution["tokens"].items():
+        old_count = token_count.get(token, 0)
+        update_hash(token_count, token, sign * count)
+        if old_count == 0:
+            add_stem(backendTables, token, stemmer)
+            names += ["hash_stem", "hash_unstem"]
+        elif token not in token_count:
+            remove_stem(backendTables, token)
+            names += ["hash_stem", "hash_unstem"]
+    if changed_tables is not None:
+        changed_tables.update(names)
+
+    doc = get_doc(entity_ID)
+    key = (doc, contribution["title"])
+    if sign > 0:
+        if key not in sections:
+            used = [index[1] for index in sections.values() if index[0] == doc]
+            sections[key] = (doc, max(used) + 1 if used else 0)
+        index = sections[key]
+        backendTables["ID_to_content"][entity_ID] = contribution["content"]
+        backendTables["ID_size"][entity_ID] = contribution["size"]
+        backendTables["ID_to_index"][entity_ID] = index
+        backendTables["Index_to_IDs"].setdefault(index, {})[entity_ID] = contribution["size"]
+        if contribution["agents"]:
+            backendTables["ID_to_agents"][entity_ID] = contribution["agents"]
+    else:
+        index = backendTables["ID_to_index"].pop(entity_ID)
+        del backendTables["ID_to_content"][entity_ID]
+        del backendTables["ID_size"][entity_ID]
+        backendTables["ID_to_agents"].pop(entity_ID, None)
+        del backendTables["Index_to_IDs"][index][entity_ID]
+        if not backendTables["Index_to_IDs"][index]:
+            del backendTables["Index_to_IDs"][index]
+            del sections[key]
+    return backendTables
+
+
+def renumber_sections(backendTables, sections, indexed):
+    """Number the sections of each document in order of first appearance in indexed.
+
+    This is the numbering of a full build: after an incremental update, new
+    sections would otherwise get the next free index and deleted ones leave a
+    gap. Returns True if an index changed.
+    """
+    keys = {index: key for key, index in sections.items()}
+    ID_to_index = backendTables["ID_to_index"]
+    new_sections = {}
+    n_sections = {}  # doc -> sections numbered so far
+    for entity_ID in indexed:
+        key = keys[ID_to_index[entity_ID]]
+        if key not in new_sections:
+            doc = key[0]
+            new_sections[key] = (doc, n_sections.get(doc, 0))
+            n_sections[doc] = n_sections.get(doc, 0) + 1
+    if new_sections == sections:
+        return False
+    new_index = {sections[key]: index for key, index in new_sections.items()}
+    for entity_ID in indexed:
+        ID_to_index[entity_ID] = new_index[ID_to_index[entity_ID]]
+    backendTables["Index_to_IDs"] = {
+        new_index[index]: IDs for index, IDs in backendTables["Index_to_IDs"].items()
+    }
+    sections.clear()
+    sections.update(new_sections)
+    return True
+
+
+# --- [3] Generate tables, from scratch or incrementally
+
+def get_shard(entity_ID, n_shards):
+    """Shard of an entity: stable hash of its ID (the same in every process)."""
+    return zlib.crc32(entity_ID.encode("utf-8")) % n_shards
+
+
+def get_shard_path(path, shard):
+    return path + "shard_%d/" % shard
+
+
+def get_content_hash(content):
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def read_repositories(filenames=REPOSITORIES, path=""):
+    """Entities found in the repository files, as {entityID: content}, in file order."""
+    entities = {}
+    for filename in filenames:
+        if "http" not in path and llm.get_table_path(filename, path) is None:
+            continue
+        for line in llm.get_data(filename, path):
+            entity_ID, content = parse_entity(line)
+            if entity_ID is not None:
+                entities[entity_ID] = content
+    return entities
+
+
+def find_entity_duplicates(entities, backendParams, stopwords, signatures=None, manifest=None):
+    """ID_to_duplicates of the entities if backendParams["dedup"] is on, else {}.
+
+    signatures: dedup.Signatures store (created if None), pruned to the
+    contents in manifest ({entityID: content hash}, computed if None).
+    """
+    if not backendParams.get("dedup"):
+        return {}
+    from .dedup import Signatures, find_duplicates
+
+    if signatures is None:
+        signatures = Signatures(stopwords)
+    if manifest is None:
+        manifest = {entity_ID: get_content_hash(content) for entity_ID, content in entities.items()}
+    duplicates = find_duplicates(
+        entities,
+        stopwords,
+        backendParams["dedup_threshold"],
+        signatures=signatures,
+        content_hashes=manifest,
+    )
+    signatures.keep(manifest.values())
+    return duplicates
+
+
+def generate_backend_tables(
+    backendParams=None,
+    filenames=REPOSITORIES,
+    path="",
+    backendTables=None,
+    manifest=None,
+    verbose=True,
+    stemmer=None,
+    shard=None,
+    changed_tables=None,
+    signatures=None,
+    entities=None,
+    duplicates=None,
+):
+    """Build the backend tables from the repository files.
+
+    The manifest maps each entity ID to a hash of its content. When the
+    backendTables and manifest of a previous run are passed (built with the
+    same backendParams), only new, changed and deleted entities are parsed:
+    old contributions are subtracted from the tables and new ones added.
+    Otherwise all tables are built from scratch.
+
+    If backendParams["dedup"] is on, near-duplicates of an earlier entity are
+    not indexed; ID_to_duplicates maps each canonical entity to its copies.
+    signatures (a dedup.Signatures store, created if None) keeps the MinHash
+    signatures of previous runs, so only new or changed contents are hashed.
+
+    With use_stem, tokens are stemmed through stemmer (a Stemmer service,
+    created if None), which first learns the stems of hash_stem / hash_unstem.
+
+    shard = (k, n_shards) builds shard k only: the entities whose ID hashes
+    to k (see get_shard). Near-duplicates are found on all entities first,
+    so a copy is skipped even if its canonical entity is in another shard.
+
+    entities ({entityID: content}, in repository order) and duplicates, if
+    not None, are used instead of reading filenames and finding duplicates:
+    update_sharded_tables reads and deduplicates the repositories once, and
+    passes each shard its own partition.
+
+    changed_tables, if a set, collects the names of the tables that were modified.
+
+    Returns:
+        (backendTables, manifest)
+    """
+    if backendParams is None:
+        backendParams = get_backend_params()
+    if backendTables is None or manifest is None:
+        backendTables = get_tables_dict()
+        manifest = {}
+    stopwords = backendTables["stopwords"]
+    start = time.perf_counter()
+    if backendParams["use_stem"]:
+        if stemmer is None:
+            stemmer = Stemmer()
+        stemmer.merge_tables(backendTables["hash_stem"], backendTables["hash_unstem"])
+
+    if entities is None:
+        entities = read_repositories(filenames, path)
+    new_manifest = {}
+    for entity_ID, content in entities.items():
+        new_manifest[entity_ID] = get_content_hash(content)
+
+    if duplicates is None:
+        duplicates = find_entity_duplicates(
+            entities, backendParams, stopwords, signatures, new_manifest
+        )
+    skipped = set(entity_ID for IDs in duplicates.values() for entity_ID in IDs)
+    indexed = [ID for ID in new_manifest if ID not in skipped]
+    if shard is not None:
+        k, n_shards = shard
+        new_manifest = {ID: new_manifest[ID] for ID in new_manifest if get_shard(ID, n_shards) == k}
+        indexed = [ID for ID in indexed if ID in new_manifest]
+        duplicates = {ID: duplicates[ID] for ID in duplicates if ID in new_manifest}
+        skipped = set(entity_ID for IDs in duplicates.values() for entity_ID in IDs)
+
+    old_indexed = backendTables["ID_to_content"]  # entities in the tables now
+    deleted = [ID for ID in old_indexed if ID not in new_manifest or ID in skipped]
+    changed = [ID for ID in indexed if ID in old_indexed and manifest.get(ID) != new_manifest[ID]]
+    added = [ID for ID in indexed if ID not in old_indexed]
+
+    sections = get_sections(backendTables)
+    tables = set()  # names of the modified tables
+    for entity_ID in deleted + changed:
+        content = backendTables["ID_to_content"][entity_ID]
+        contribution = get_contribution(entity_ID, content, backendParams, stopwords, stemmer)
+        apply_contribution(backendTables, entity_ID, contribution, sections, -1, stemmer, tables)
+
+    updated = set(added + changed)
+    for entity_ID in indexed:
+        if entity_ID in updated:
+            content = entities[entity_ID]
+            contribution = get_contribution(entity_ID, content, backendParams, stopwords, stemmer)
+            apply_contribution(backendTables, entity_ID, contribution, sections, 1, stemmer, tables)
+    if renumber_sections(backendTables, sections, indexed):
+        tables.update(("ID_to_index", "Index_to_IDs"))
+    if backendTables["ID_to_duplicates"] != duplicates:
+        tables.add("ID_to_duplicates")
+    backendTables["ID_to_duplicates"] = duplicates
+    if changed_tables is not None:
+        changed_tables.update(tables)
+
+    if verbose:
+        print(
+            "%d added, %d changed, %d deleted, %d unchanged entities in %.2f sec"
+            % (
+                len(added),
+                len(changed),
+                len(deleted),
+                len(indexed) - len(added) - len(changed),
+                time.perf_counter() - start,
+            )
+        )
+        if backendParams.get("dedup"):
+            print(
+                "%d near-duplicates of %d entities not indexed (%d of %d entities indexed)"
+                % (len(skipped), len(duplicates), len(indexed), len(new_manifest))
+            )
+        if stemmer is not None:
+            stats = stemmer.get_stats()
+            print(
+                "stems: %d lookups, hit rate %.4f, %d stemmer calls"
+                % (stats["lookups"], stats["hit_rate"], stats["stemmer_calls"])
+            )
+    return backendTables, new_manifest
+
+
+def update_backend_tables(
+    path="",
+    backendParams=None,
+    filenames=REPOSITORIES,
+    verbose=True,
+    shard=None,
+    text=False,
+    entities=None,
+    duplicates=None,
+):
+    """Nightly update: load tables and manifest from path, apply repository changes, save.
+
+    Tables are rebuilt from scratch if backendParams changed since the last run.
+    They are kept as binary files (backend_<name>.pkl), which load much faster
+    than the text tables, and only the tables modified by the update are
+    rewritten. With text = True, the modified text tables (backend_<name>.txt,
+    read by load_backend_tables from a URL) are written as well.
+
+    Stems computed with use_stem are kept in path/backend_stem_cache.txt, so
+    the stemmer is only called on tokens never seen before, and written back
+    into hash_stem / hash_unstem for queries. Likewise with dedup, MinHash
+    signatures are kept in path/backend_dedup_cache.pkl. With
+    shard = (k, n_shards), the tables of shard k are kept in path/shard_<k>/.
+    entities and duplicates are passed to generate_backend_tables.
+    """
+    if backendParams is None:
+        backendParams = get_backend_params()
+    tables_path = path
+    if shard is not None:
+        tables_path = get_shard_path(path, shard[0])
+        os.makedirs(tables_path, exist_ok=True)
+        backendParams = dict(backendParams, shards=shard[1])  # rebuild if n_shards changes
+    backendTables = manifest = None
+    if read_backend_params(tables_path) == backendParams:
+        backendTables = load_backend_tables_from_disk(tables_path)
+        manifest = read_manifest(tables_path)
+    old_manifest = manifest
+    stemmer = Stemmer(filename=tables_path + CACHE_FILENAME) if backendParams["use_stem"] else None
+    signatures = None
+    if backendParams.get("dedup") and duplicates is None:
+        from . import dedup
+
+        signatures = dedup.Signatures(STOPWORDS, filename=tables_path + dedup.CACHE_FILENAME)
+    changed_tables = set()
+    backendTables, manifest = generate_backend_tables(
+        backendParams, filenames, path, backendTables, manifest, verbose, stemmer, shard,
+        changed_tables, signatures, entities, duplicates,
+    )
+    if stemmer is not None and stemmer.write_tables(
+        backendTables["hash_stem"], backendTables["hash_unstem"]
+    ):
+        changed_tables.update(("hash_stem", "hash_unstem"))
+    if old_manifest is None:
+        changed_tables = set(TABLE_NAMES)
+    names = [
+        name for name in TABLE_NAMES
+        if name in changed_tables or not os.path.exists(get_binary_path(name, tables_path))
+    ]
+    save_binary_tables(backendTables, tables_path, names)
+    save_backend_tables(
+        backendTables,
+        tables_path,
+        backendParams,
+        manifest if manifest != old_manifest else None,
+        names if text else (),
+    )
+    if stemmer is not None:
+        stemmer.save()
+    if signatures is not None:
+        signatures.save()
+    return backendTables
+
+
+# --- [4] Save and load tables
+
+def format_key(key, key_format):
+    if key_format == "str":
+        return key
+    return str(key)
+
+
+def parse_value(string, value_format):
+    if value_format == "int":
+        return int(string)
+    elif value_format == "hash":
+        return llm.text_to_hash(string)
+    elif value_format == "list":
+        return llm.text_to_list(string)
+    elif value_format == "index":
+        return tuple(int(item) for item in llm.text_to_list(string))
+    return string
+
+
+def save_backend_tables(
+    backendTables, path="", backendParams=None, manifest=None, names=TABLE_NAMES
+):
+    """Save the text tables in names, the stopwords, and backendParams / manifest if given."""
+    for name in names:
+        key_format = TABLE_FORMATS[name][0]
+        table = backendTables[name]
+        with open(path + "backend_" + name + ".txt", "w", encoding="utf-8") as OUT:
+            for key in table:
+                OUT.write(format_key(key, key_format) + "\t" + str(table[key]) + "\n")
+    with open(path + "backend_stopwords.txt", "w", encoding="utf-8") as OUT:
+        OUT.write(str(backendTables["stopwords"]) + "\n")
+    if backendParams is not None:
+        with open(path + "backendParams.txt", "w", encoding="utf-8") as OUT:
+            OUT.write(str(backendParams) + "\n")
+    if manifest is not None:
+        with open(path + "backend_manifest.txt", "w", encoding="utf-8") as OUT:
+            for entity_ID in manifest:
+                OUT.write(entity_ID + "\t" + manifest[entity_ID] + "\n")
+
+
+def get_binary_path(name, path=""):
+    return path + "backend_" + name + ".pkl"
+
+
+def save_binary_tables(backendTables, path="", names=TABLE_NAMES):
+    """Save tables as backend_<name>.pkl, for load_backend_tables_from_disk()."""
+    for name in names:
+        filename = get_binary_path(name, path)
+        with open(filename + ".tmp", "wb") as OUT:
+            pickle.dump(backendTables[name], OUT, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
+
+
+def read_backend_table(name, path=""):
+    key_format, value_format = TABLE_FORMATS[name]
+    table = {}
+    for line in llm.get_data("backend_" + name + ".txt", path):
+        line = line.split("\t", 1)
+        if len(line) > 1:
+            table[parse_value(line[0], key_format)] = parse_value(line[1], value_format)
+    return table
+
+
+def load_backend_tables(path=""):
+    """Load the backend tables saved in path (a local directory or a URL)."""
+    backendTables = get_tables_dict()
+    for name in TABLE_NAMES:
+        backendTables[name] = read_backend_table(name, path)
+    backendTables["stopwords"] = llm.read_stopwords("backend_stopwords.txt", path)
+    return backendTables
+
+
+def load_backend_tables_from_disk(path=""):
+    """Load the backend tables saved in a local directory; missing tables are empty.
+
+    A table is read from its binary file (see save_binary_tables) unless the
+    text table, plain or compressed, is more recent. Binary files are pickles:
+    only load tables written by this package.
+    """
+    backendTables = get_tables_dict()
+    for name in TABLE_NAMES:
+        text_path = llm.get_table_path("backend_" + name + ".txt", path)
+        binary_path = get_binary_path(name, path)
+        if os.path.exists(binary_path) and (
+            text_path is None or os.stat(binary_path).st_mtime_ns >= os.stat(text_path).st_mtime_ns
+        ):
+            with open(binary_path, "rb") as IN:
+                backendTables[name] = pickle.load(IN)
+        elif text_path is not None:
+            backendTables[name] = read_backend_table(name, path)
+    if llm.get_table_path("backend_stopwords.txt", path) is not None:
+        backendTables["stopwords"] = llm.read_stopwords("backend_stopwords.txt", path)
+    return backendTables
+
+
+def read_manifest(path=""):
+    """Entity ID to content hash, as saved by the last run (None if there is none)."""
+    if llm.get_table_path("backend_manifest.txt", path) is None:
+        return None
+    manifest = {}
+    for line in llm.get_data("backend_manifest.txt", path):
+        line = line.split("\t")
+        if len(line) > 1:
+            manifest[line[0]] = line[1]
+    return manifest
+
+
+def read_backend_params(path=""):
+    if llm.get_table_path("backendParams.txt", path) is None:
+        return None
+    return ast.literal_eval(next(llm.get_data("backendParams.txt", path)))
+
+
+def publish_backend_tables(backendTables, filename):
+    """Publish the query-time tables once, for query workers to attach to."""
+    tables = {"stopwords": backendTables["stopwords"]}
+    for name in SHARED_TABLES:
+        tables[name] = backendTables[name]
+    publish_tables(tables, filename)
+
+
+def attach_backend_tables(filename):
+    """Attach read-only to tables published with publish_backend_tables()."""
+    store = attach_tables(filename)
+    backendTables = dict(store)
+    backendTables["stopwords"] = tuple(store["stopwords"])
+    return backendTables
@@ -0,0 +1,94 @@
+"""Configuration for XLLM Enterprise."""
+
+# tables saved as backend_<name>.txt by the backend, in this order
+TABLE_NAMES = (
+    "dictionary",
+    "hash_pairs",
+    "hash_context1",
+    "hash_stem",
+    "hash_unstem",
+    "token_count",
+    "ID_to_content",
+    "ID_to_agents",
+    "ID_size",
+    "ID_to_index",
+    "Index_to_IDs",
+    "ID_to_duplicates",
+)
+
+STOPWORDS = (
+    "", "-", "in", "the", "and", "to", "of", "a", "this", "for", "is", "with", "from", "as",
+    "on", "an", "that", "it", "are", "within", "will", "by", "or", "its", "can", "your", "be",
+    "about", "used", "our", "their", "you", "into", "using", "these", "which", "we", "how",
+    "see", "below", "all", "use", "across", "provide", "provides", "aims", "one", "&",
+    "ensuring", "crucial", "at", "various", "through", "find", "ensure", "more", "another",
+    "but", "should", "considered", "provided", "must", "whether", "located", "where", "begins",
+    "any", "what", "some", "under", "does", "belong", "included", "part", "associated",
+)  # fmt: skip
+
+
+def get_backend_params():
+    """Parameters used to build the backend tables (saved as backendParams.txt)."""
+    backendParams = {
+        "max_multitoken": 4,  # maximum number of tokens in a word
+        "maxDist": 3,  # maximum distance between 2 tokens forming a pair
+        "create_hpairs": True,  # build hash_pairs
+        "create_ctokens": False,  # not used
+        "use_stem": False,  # build dictionary on stems rather than tokens
+        "dedup": False,  # index one copy of near-duplicate entities
+        "dedup_threshold": 0.8,  # minimum Jaccard similarity of near-duplicates
+        "extraWeights": {
+            "description": 0.0,
+            "category": 0.0,
+            "tag_list": 0.0,
+            "title": 0.0,
+            "meta": 0.0,
+        },
+    }
+    return backendParams
+
+
+def get_frontend_params():
+    """Parameters used at query time."""
+    frontendParams = {
+        "maxTokenCount": 1000,  # ignore query words more frequent than this
+        "ignoreList": ("data",),  # query words ignored when scoring entities
+        "maxResults": 10,  # number of entities returned by process_query
+    }
+    return frontendParams
+
+
+def get_agents():
+    """Map words (~-joined tokens) to the agents attached to entities that contain them."""
+    agents = {
+        "accelerated~computing": "Accelerated Computing",
+        "assets": "Assets",
+        "cash": "Cash",
+        "common~stock": "Common Stock",
+        "data": "Data",
+        "data~center": "Data Center",
+        "directors": "Directors",
+        "equity": "Equity",
+        "financial~statements": "Financial Statements",
+        "income": "Income",
+        "management": "Management",
+        "non-gaap": "Non-GAAP",
+        "products": "Products",
+        "restricted~stock": "Restricted Stock",
+        "revenue": "Revenue",
+        "securities": "Securities",
+        "stock": "Stock",
+        "tax": "Tax",
+        "2022": "Year 2022",
+        "2023": "Year 2023",
+    }
+    return agents
+
+
+def get_tables_dict():
+    """Empty backend tables, keyed by table name."""
+    backendTables = {}
+    for name in TABLE_NAMES:
+        backendTables[name] = {}
+    backendTables["stopwords"] = STOPWORDS
+    return backendTables
@@ -0,0 +1,255 @@
+"""Near-duplicate entity detection for XLLM Enterprise.
+
+Repositories built from PDFs repeat a lot of boilerplate: legal notices,
+table headers, the same paragraph in every quarterly report. Each entity is
+reduced to a set of shingles (runs of shingle_size consecutive tokens), and a
+MinHash signature of that set. Signatures are split into bands; entities
+sharing a band are candidate duplicates (LSH), and a candidate is accepted
+if the Jaccard similarity of the shingle sets is at least the threshold.
+
+Entities are scanned in repository order. An entity that is a near-duplicate
+of an earlier canonical entity is not indexed: it is listed in
+ID_to_duplicates[canonical ID] instead. Only canonical entities are put in
+the LSH buckets, so clusters do not chain.
+
+Shingling and MinHash are the expensive part. With a Signatures store, the
+shingles and signature of a content are computed once and kept, keyed by the
+content hash of the manifest; update_backend_tables saves them in
+backend_dedup_cache.pkl, so a nightly update only MinHashes new or changed
+entities, and the scan itself is a few dictionary lookups per entity.
+"""
+
+import os
+import pickle
+import zlib
+
+from .backend import REPOSITORIES, generate_backend_tables, get_content_hash, get_fields, get_runs
+from .config import get_backend_params
+
+MASK = (1 << 64) - 1
+CACHE_FILENAME = "backend_dedup_cache.pkl"
+
+
+def get_shingles(content, stopwords, shingle_size=3):
+    """Set of hashed token shingles of an entity content (all fields)."""
+    tokens = []
+    for text in get_fields(content).values():
+        for run in get_runs(text, stopwords):
+            tokens.extend(run)
+    if len(tokens) <= shingle_size:
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(tokens[k : k + shingle_size]).encode("utf-8"))
+        for k in range(len(tokens) - shingle_size + 1)
+    }
+
+
+def get_hash_params(n_hashes, seed=0):
+    """Odd multipliers and offsets of the n_hashes multiply-shift hash functions."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, MASK, size=n_hashes, dtype=np.uint64, endpoint=True)
+    multipliers |= np.uint64(1)
+    offsets = rng.integers(0, MASK, size=n_hashes, dtype=np.uint64, endpoint=True)
+    return multipliers, offsets
+
+
+def get_signature(shingles, hash_params):
+    """MinHash signature: minimum of each hash function over the shingles."""
+    import numpy as np
+
+    multipliers, offsets = hash_params
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    hashes = (np.outer(multipliers, values) + offsets[:, None]) >> np.uint64(32)  # mod 2**64
+    return hashes.min(axis=1)
+
+
+def get_jaccard(shinglesA, shinglesB):
+    return len(shinglesA & shinglesB) / len(shinglesA | shinglesB)
+
+
+class Signatures:
+    """Shingles and LSH band keys of entity contents, keyed by content hash."""
+
+    def __init__(self, stopwords, n_bands=32, n_rows=4, shingle_size=3, filename=None):
+        self.params = (tuple(stopwords), n_bands, n_rows, shingle_size)
+        self.n_bands = n_bands
+        self.n_rows = n_rows
+        self.shingle_size = shingle_size
+        self.hash_params = None
+        self.entries = {}  # content hash -> (shingles, band keys)
+        self.filename = filename
+        self.changed = False
+        self.computed = 0
+        if filename is not None and os.path.exists(filename):
+            self.load(filename)
+
+    def load(self, filename):
+        """Add the entries of a cache file built with the same parameters."""
+        with open(filename, "rb") as IN:
+            params, entries = pickle.load(IN)
+        if params == self.params:
+            self.entries.update(entries)
+
+    def save(self, filename=None):
+        """Write the entries to the cache file, if they changed."""
+        filename = filename if filename is not None else self.filename
+        if filename is None or (filename == self.filename and not self.changed):
+            return
+        with open(filename + ".tmp", "wb") as OUT:
+            pickle.dump((self.params, self.entries), OUT, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
+        if filename == self.filename:
+            self.changed = False
+
+    def keep(self, content_hashes):
+        """Drop the entries of contents no longer in the repositories."""
+        content_hashes = set(content_hashes)
+        stale = [key for key in self.entries if key not in content_hashes]
+        for key in stale:
+            del self.entries[key]
+        self.changed = self.changed or bool(stale)
+
+    def get(self, content, content_hash=None):
+        """(shingles, band keys) of a content, MinHashed only if never seen before."""
+        if content_hash is None:
+            content_hash = get_content_hash(content)
+        entry = self.entries.get(content_hash)
+        if entry is None:
+            if self.hash_params is None:
+                self.hash_params = get_hash_params(self.n_bands * self.n_rows)
+            shingles = frozenset(get_shingles(content, self.params[0], self.shingle_size))
+            signature = get_signature(shingles, self.hash_params)
+            n_rows = self.n_rows
+            keys = tuple(
+                (band, signature[band * n_rows : (band + 1) * n_rows].tobytes())
+                for band in range(self.n_bands)
+            )
+            entry = self.entries[content_hash] = (shingles, keys)
+            self.changed = True
+            self.computed += 1
+        return entry
+
+
+def find_duplicates(
+    entities,
+    stopwords,
+    threshold=0.8,
+    n_bands=32,
+    n_rows=4,
+    shingle_size=3,
+    signatures=None,
+    content_hashes=None,
+):
+    """Cluster near-identical entities.
+
+    Args:
+        entities: {entityID: content}, in repository order
+        threshold: minimum Jaccard similarity of the shingle sets
+        n_bands, n_rows: LSH banding of signatures of n_bands * n_rows hashes;
+            pairs with similarity (1 / n_bands) ** (1 / n_rows) are candidates
+            half of the time, much more similar pairs almost always
+        signatures: Signatures store reused across runs (created if None)
+        content_hashes: {entityID: content hash}, e.g. the manifest, so
+            contents are not hashed again
+
+    Returns:
+        {canonical entityID: tuple of duplicate entityIDs}, for clusters with
+        at least one duplicate
+    """
+    if signatures is None:
+        signatures = Signatures(stopwords, n_bands, n_rows, shingle_size)
+    content_hashes = content_hashes or {}
+    buckets = {}  # (band, band signature) -> canonical entity IDs
+    canonical_shingles = {}
+    duplicates = {}
+
+    for entity_ID, content in entities.items():
+        shingles, keys = signatures.get(content, content_hashes.get(entity_ID))
+        canonical_ID = None
+        checked = set()
+        for key in keys:
+            for candidate_ID in buckets.get(key, ()):
+                if candidate_ID not in checked:
+                    checked.add(candidate_ID)
+                    if get_jaccard(shingles, canonical_shingles[candidate_ID]) >= threshold:
+                        canonical_ID = candidate_ID
+                        break
+            if canonical_ID is not None:
+                break
+
+        if canonical_ID is None:
+            canonical_shingles[entity_ID] = shingles
+            for key in keys:
+                buckets.setdefault(key, []).append(entity_ID)
+        else:
+            duplicates[canonical_ID] = (*duplicates.get(canonical_ID, ()), entity_ID)
+    return duplicates
+
+
+def get_table_sizes(backendTables, names):
+    """Number of entries of each table, nested entries included."""
+    sizes = {}
+    for name in names:
+        size = 0
+        for value in backendTables[name].values():
+            size += len(value) if isinstance(value, (dict, tuple)) else 1
+        sizes[name] = size
+    return sizes
+
+
+def compare_dedup(
+    queries, filenames=REPOSITORIES, path="", backendParams=None, frontendParams=None, verbose=True
+):
+    """Build the tables with and without dedup; compare their size and the query results.
+
+    Results without dedup are mapped to their canonical entity before they are
+    compared: the overlap of a query is the fraction of these canonical IDs
+    also returned with dedup (1.0 when dedup loses nothing).
+
+    Returns:
+        dict with the table sizes of both builds, their reduction, and the
+        overlap of each query
+    """
+    from .processor import process_query
+
+    if backendParams is None:
+        backendParams = get_backend_params()
+    names = ("dictionary", "hash_pairs", "hash_context1", "ID_to_content", "ID_to_agents")
+    tables = {}
+    for dedup in (False, True):
+        params = dict(backendParams, dedup=dedup)
+        tables[dedup], _ = generate_backend_tables(params, filenames, path, verbose=False)
+        tables[dedup]["params"] = params
+
+    canonical = {}
+    for canonical_ID, IDs in tables[True]["ID_to_duplicates"].items():
+        for entity_ID in IDs:
+            canonical[entity_ID] = canonical_ID
+    report = {
+        "sizes": get_table_sizes(tables[False], names),
+        "dedup_sizes": get_table_sizes(tables[True], names),
+        "overlap": {},
+    }
+    total = sum(report["sizes"].values())
+    report["reduction"] = 1 - sum(report["dedup_sizes"].values()) / total if total else 0.0
+
+    for query in queries:
+        results = {}
+        for dedup in (False, True):
+            found = process_query(query, tables[dedup], tables[dedup]["params"], frontendParams)
+            results[dedup] = set(canonical.get(entity_ID, entity_ID) for entity_ID, _ in found)
+        if results[False]:
+            report["overlap"][query] = len(results[False] & results[True]) / len(results[False])
+        else:
+            report["overlap"][query] = 1.0
+
+    if verbose:
+        print("table          entries   dedup")
+        for name in names:
+            print("%-13s %8d %7d" % (name, report["sizes"][name], report["dedup_sizes"][name]))
+        print("index size reduction: %.1f%%" % (100 * report["reduction"]))
+        for query, overlap in report["overlap"].items():
+            print("%4.2f  %s" % (overlap, query))
+    return report
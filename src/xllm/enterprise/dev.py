@@ -1,5 +1,5 @@
 """Developer interface for XLLM Enterprise."""
 
-from src.xllm.enterprise.config import get_backend_params, get_frontend_params, get_tables_dict
-from src.xllm.enterprise.backend import generate_backend_tables, load_backend_tables_from_disk
-from src.xllm.enterprise.processor import process_query 
\ No newline at end of file
+from .config import get_backend_params, get_frontend_params, get_tables_dict
+from .backend import generate_backend_tables, load_backend_tables_from_disk
+from .processor import process_query 
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""PDF processor for XLLM Enterprise.
+
+Turns PDF documents into repository lines of the form
+
+    entityID~~{title::...||description::...}
+
+one entity per text block, titled by the most recent heading found above it.
+Pages are streamed: each worker opens its own handle on the document, parses
+a bounded range of pages, and hands the entities back to the parent, which
+writes them to the repository file as soon as they arrive. Memory per worker
+is therefore bounded by `pages_per_task`, not by the size of the document.
+"""
+
+import os
+import sys
+import time
+
+
+def open_pdf(filename):
+    """Open a PDF with PyMuPDF (imported here: only needed for PDF ingestion)."""
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf  # older PyMuPDF releases
+    return pymupdf.open(filename)
+
+
+def clean_text(text):
+    """Flatten whitespace and strip characters reserved by the repository format."""
+    for symbol in ("~~", "||", "::", "{", "}"):
+        text = text.replace(symbol, " ")
+    return " ".join(text.split())
+
+
+def get_page_blocks(page):
+    """Return [(text, font_size)] for the text blocks of a page, in reading order."""
+    blocks = []
+    for block in page.get_text("dict")["blocks"]:
+        if block["type"] != 0:  # image block
+            continue
+        lines = []
+        size = 0
+        for line in block["lines"]:
+            lines.append(" ".join(span["text"] for span in line["spans"]))
+            for span in line["spans"]:
+                if span["text"].strip():
+                    size = max(size, span["size"])
+        text = clean_text(" ".join(lines))
+        if text != "":
+            blocks.append((text, round(size, 1)))
+    return blocks
+
+
+def get_body_size(blocks):
+    """Most common font size on the page, weighted by characters: the body text size."""
+    chars = {}
+    for text, size in blocks:
+        chars[size] = chars.get(size, 0) + len(text)
+    return max(chars, key=chars.get) if chars else 0
+
+
+def parse_pages(filename, first_page, last_page, title=""):
+    """Parse pages [first_page, last_page) of a PDF.
+
+    Returns a list of (page_number, title, description) entities and the last
+    heading seen, so the caller can carry it over to the next page range.
+    """
+    entities = []
+    doc = open_pdf(filename)
+    try:
+        for page_number in range(first_page, min(last_page, len(doc))):
+            blocks = get_page_blocks(doc[page_number])
+            body_size = get_body_size(blocks)
+            for text, size in blocks:
+                if size > body_size and len(text) < 200:
+                    title = text
+                else:
+                    entities.append((page_number, title, text))
+    finally:
+        doc.close()
+    return entities, title
+
+
+def _parse_task(task):
+    """Pool entry point: parse one page range of one document."""
+    doc_index, filename, first_page, last_page = task
+    entities, last_title = parse_pages(filename, first_page, last_page)
+    return doc_index, entities, last_title
+
+
+def get_page_count(filename):
+    doc = open_pdf(filename)
+    n_pages = len(doc)
+    doc.close()
+    return n_pages
+
+
+def create_tasks(filenames, pages_per_task, page_counts=None):
+    """Split every document into page ranges of at most pages_per_task pages."""
+    if page_counts is None:
+        page_counts = [get_page_count(filename) for filename in filenames]
+    tasks = []
+    for doc_index, (filename, n_pages) in enumerate(zip(filenames, page_counts)):
+        for first_page in range(0, n_pages, pages_per_task):
+            last_page = min(first_page + pages_per_task, n_pages)
+            tasks.append((doc_index, filename, first_page, last_page))
+    return tasks
+
+
+def iter_pdf_entities(filenames, n_workers=1, pages_per_task=16, page_counts=None):
+    """Yield (entityID, title, description) for a list of PDFs, page range by page range.
+
+    Entity IDs are 'B<n>X<doc>', with n a running block number within document
+    doc, so the output does not depend on n_workers. Headings that span page
+    ranges are carried over: a block with no heading in its own range inherits
+    the last heading of the previous range. page_counts, if known, saves
+    opening every document once more to count its pages.
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    tasks = create_tasks(filenames, pages_per_task, page_counts)
+    block_counter = {}
+    carry_title = {}
+
+    if n_workers > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(n_workers)
+        results = pool.imap(_parse_task, tasks)  # ordered, streamed
+    else:
+        pool = None
+        results = map(_parse_task, tasks)
+
+    try:
+        for doc_index, entities, last_title in results:
+            previous_title = carry_title.get(doc_index, "")
+            counter = block_counter.get(doc_index, 0)
+            for _page_number, title, description in entities:
+                if title == "":
+                    title = previous_title
+                else:
+                    previous_title = title
+                yield "B" + str(counter) + "X" + str(doc_index), title, description
+                counter += 1
+            block_counter[doc_index] = counter
+            carry_title[doc_index] = last_title if last_title != "" else previous_title
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def format_entity(entity_ID, title, description):
+    """Repository line for one entity."""
+    return entity_ID + "~~{title::" + title + "||description::" + description + "}"
+
+
+def process_pdf(filenames, output="repository.txt", n_workers=1, pages_per_task=16, verbose=True):
+    """Convert PDFs into a repository file, streaming entities as they are produced.
+
+    Args:
+        filenames: a PDF filename, or a list of them
+        output: repository file to write (one entity per line)
+        n_workers: number of worker processes; page ranges of all documents
+            are distributed across the pool
+        pages_per_task: pages parsed per task; bounds memory used by a worker
+
+    Returns:
+        dict with pages, entities, seconds and pages_per_sec
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    page_counts = [get_page_count(filename) for filename in filenames]
+    n_pages = sum(page_counts)
+    n_entities = 0
+    start = time.perf_counter()
+
+    with open(output, "w", encoding="utf-8") as OUT:
+        for entity_ID, title, description in iter_pdf_entities(
+            filenames, n_workers=n_workers, pages_per_task=pages_per_task, page_counts=page_counts
+        ):
+            OUT.write(format_entity(entity_ID, title, description) + "\n")
+            n_entities += 1
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "documents": len(filenames),
+        "pages": n_pages,
+        "entities": n_entities,
+        "seconds": seconds,
+        "pages_per_sec": n_pages / seconds if seconds > 0 else 0.0,
+    }
+    if verbose:
+        print(
+            "%d documents, %d pages, %d entities in %.2f sec (%.1f pages/sec)"
+            % (len(filenames), n_pages, n_entities, seconds, stats["pages_per_sec"])
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print("usage: python -m xllm.enterprise.pdf_processor file.pdf [file2.pdf ...]")
+        sys.exit(1)
+    process_pdf(args, n_workers=os.cpu_count() or 1)
@@ -1,4 +1,86 @@
 """Query processing for XLLM Enterprise."""
 
-from src.xllm.enterprise.config import get_frontend_params
-from src.xllm.enterprise.utils import update_hash, update_nested_hash, get_value 
\ No newline at end of file
+from .backend import get_runs
+from .config import get_backend_params, get_frontend_params
+from .stemmer import get_default_stemmer
+from .utils import update_hash
+
+
+def get_query_stems(run, backendTables, stemmer):
+    """Stems of query tokens: from hash_stem / hash_unstem, then stemmer for unseen tokens."""
+    hash_stem = backendTables["hash_stem"]
+    hash_unstem = backendTables["hash_unstem"]
+    stems = []
+    for token in run:
+        if token in hash_stem:
+            stems.append(hash_stem[token])
+        elif token in hash_unstem:
+            stems.append(token)
+        else:
+            stems.append(stemmer.stem(token))
+    return stems
+
+
+def get_query_words(query, backendParams, stopwords, backendTables=None, stemmer=None):
+    """Words (1 to max_multitoken tokens, ~-joined) found in the query.
+
+    With use_stem, tokens are stemmed like in the backend tables (backendTables
+    is then required).
+    """
+    max_multitoken = backendParams["max_multitoken"]
+    words = {}
+    for run in get_runs(query, stopwords):
+        if backendParams["use_stem"]:
+            run = get_query_stems(run, backendTables, stemmer or get_default_stemmer())
+        for k in range(len(run)):
+            for n in range(1, max_multitoken + 1):
+                if k + n <= len(run):
+                    update_hash(words, "~".join(run[k : k + n]))
+    return words
+
+
+def get_query_weights(query, backendTables, backendParams=None, frontendParams=None, stemmer=None):
+    """Weight of each query word used for scoring: tokens / sqrt(dictionary count).
+
+    Needs the term statistics only (dictionary, hash_stem, hash_unstem,
+    stopwords), so a coordinator can compute it once for all shards.
+    """
+    if backendParams is None:
+        backendParams = get_backend_params()
+    if frontendParams is None:
+        frontendParams = get_frontend_params()
+    dictionary = backendTables["dictionary"]
+
+    weights = {}
+    stopwords = backendTables["stopwords"]
+    for word in get_query_words(query, backendParams, stopwords, backendTables, stemmer):
+        if word in frontendParams["ignoreList"] or word not in dictionary:
+            continue
+        word_count = dictionary[word]
+        if word_count > frontendParams["maxTokenCount"]:
+            continue
+        n_tokens = word.count("~") + 1
+        weights[word] = n_tokens / word_count**0.50
+    return weights
+
+
+def score_entities(weights, hash_context1, maxResults):
+    """Top entities for word weights, as a list of (entityID, score), best first."""
+    scores = {}
+    for word, weight in weights.items():
+        for entity_ID, count in hash_context1.get(word, {}).items():
+            update_hash(scores, entity_ID, count * weight)
+    results = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return results[:maxResults]
+
+
+def process_query(query, backendTables, backendParams=None, frontendParams=None, stemmer=None):
+    """Entities matching the query, as a list of (entityID, score), best first.
+
+    An entity scores count * tokens / sqrt(dictionary count) for each query word
+    it contains: long, rare words weigh more than short, frequent ones.
+    """
+    if frontendParams is None:
+        frontendParams = get_frontend_params()
+    weights = get_query_weights(query, backendTables, backendParams, frontendParams, stemmer)
+    return score_entities(weights, backendTables["hash_context1"], frontendParams["maxResults"])
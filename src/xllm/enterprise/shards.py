@@ -0,0 +1,306 @@
+"""Sharded backend tables and scatter-gather query execution for XLLM Enterprise.
+
+Entities are partitioned into n_shards by a stable hash of their ID. Each
+shard is a complete set of backend tables (postings in hash_context1,
+ID_to_content, ID_to_index, Index_to_IDs, ...) for its entities, built and
+updated independently in path/shard_<k>/, possibly in parallel. The
+repositories are read and deduplicated once, and each shard only receives
+its own partition of the entities.
+
+Scores depend on global term statistics: a word weighs tokens / sqrt(count)
+with count taken over all entities. Dictionary counts are additive, so the
+global dictionary is the sum of the shard dictionaries; it is saved in path
+with the merged hash_stem / hash_unstem and the number of shards
+(backend_shards.txt), and is all the coordinator loads.
+
+At query time the coordinator computes the word weights once, scatters them
+to one worker process per shard, and merges the top-k lists they send back.
+Each worker only holds its own shard, and shards are scored in parallel.
+"""
+
+import os
+import sys
+import time
+import traceback
+from itertools import chain
+from multiprocessing import Pipe, Pool, Process
+
+from .. import xllm_util as llm
+from . import dedup
+from .backend import (
+    REPOSITORIES,
+    find_entity_duplicates,
+    generate_backend_tables,
+    get_shard,
+    get_shard_path,
+    load_backend_tables_from_disk,
+    read_backend_table,
+    read_repositories,
+    update_backend_tables,
+)
+from .config import STOPWORDS, get_backend_params, get_frontend_params
+from .processor import get_query_weights, score_entities
+
+GLOBAL_TABLES = ("dictionary", "hash_stem", "hash_unstem")
+POLL_SECONDS = 1.0  # how often the coordinator checks that a silent worker is alive
+
+
+# --- [1] Build shards and global term statistics
+
+def _update_shard(task):
+    path, backendParams, shard, entities, duplicates = task
+    update_backend_tables(
+        path, backendParams, verbose=False, shard=shard, entities=entities, duplicates=duplicates
+    )
+    return shard[0]
+
+
+def partition_entities(entities, duplicates, n_shards):
+    """[(entities, ID_to_duplicates)] of each shard; near-duplicates are in no shard."""
+    skipped = set(entity_ID for IDs in duplicates.values() for entity_ID in IDs)
+    partitions = [({}, {}) for _ in range(n_shards)]
+    for entity_ID, content in entities.items():
+        if entity_ID not in skipped:
+            partitions[get_shard(entity_ID, n_shards)][0][entity_ID] = content
+    for entity_ID, IDs in duplicates.items():
+        partitions[get_shard(entity_ID, n_shards)][1][entity_ID] = IDs
+    return partitions
+
+
+def get_global_tables(shard_tables):
+    """Term statistics over all shards: summed dictionary, merged stem tables."""
+    globalTables = {name: {} for name in GLOBAL_TABLES}
+    globalTables["n_shards"] = len(shard_tables)
+    dictionary = globalTables["dictionary"]
+    for backendTables in shard_tables:
+        for word, count in backendTables["dictionary"].items():
+            dictionary[word] = dictionary.get(word, 0) + count
+        globalTables["hash_stem"].update(backendTables["hash_stem"])
+        for stem, tokens in backendTables["hash_unstem"].items():
+            known = globalTables["hash_unstem"].get(stem, ())
+            globalTables["hash_unstem"][stem] = known + tuple(t for t in tokens if t not in known)
+        globalTables["stopwords"] = backendTables["stopwords"]
+    return globalTables
+
+
+def save_global_tables(globalTables, path=""):
+    for name in GLOBAL_TABLES:
+        with open(path + "backend_" + name + ".txt", "w", encoding="utf-8") as OUT:
+            for key, value in globalTables[name].items():
+                OUT.write(key + "\t" + str(value) + "\n")
+    with open(path + "backend_stopwords.txt", "w", encoding="utf-8") as OUT:
+        OUT.write(str(globalTables["stopwords"]) + "\n")
+    with open(path + "backend_shards.txt", "w", encoding="utf-8") as OUT:
+        OUT.write(str(globalTables["n_shards"]) + "\n")
+
+
+def load_global_tables(path=""):
+    """Term statistics saved by update_sharded_tables(), for the coordinator."""
+    globalTables = {name: read_backend_table(name, path) for name in GLOBAL_TABLES}
+    globalTables["stopwords"] = llm.read_stopwords("backend_stopwords.txt", path)
+    globalTables["n_shards"] = int(next(llm.get_data("backend_shards.txt", path)))
+    return globalTables
+
+
+def update_sharded_tables(
+    path="", n_shards=4, backendParams=None, filenames=REPOSITORIES, n_workers=1, verbose=True
+):
+    """Build or update the n_shards shards of the repositories in path, then the global tables.
+
+    The repositories are read and deduplicated once (MinHash signatures are
+    kept in path/backend_dedup_cache.pkl), then each shard is updated
+    incrementally like update_backend_tables() from its own partition,
+    n_workers at a time. Returns the global tables.
+    """
+    if backendParams is None:
+        backendParams = get_backend_params()
+    start = time.perf_counter()
+    entities = read_repositories(filenames, path)
+    signatures = None
+    if backendParams.get("dedup"):
+        signatures = dedup.Signatures(STOPWORDS, filename=path + dedup.CACHE_FILENAME)
+    duplicates = find_entity_duplicates(entities, backendParams, STOPWORDS, signatures)
+    if signatures is not None:
+        signatures.save()
+    tasks = [
+        (path, backendParams, (k, n_shards), *partition)
+        for k, partition in enumerate(partition_entities(entities, duplicates, n_shards))
+    ]
+    del entities
+    if n_workers > 1:
+        with Pool(min(n_workers, n_shards)) as pool:
+            pool.map(_update_shard, tasks)
+    else:
+        for task in tasks:
+            _update_shard(task)
+
+    shard_tables = [load_backend_tables_from_disk(get_shard_path(path, k)) for k in range(n_shards)]
+    globalTables = get_global_tables(shard_tables)
+    save_global_tables(globalTables, path)
+    if verbose:
+        sizes = " / ".join(str(len(tables["ID_to_content"])) for tables in shard_tables)
+        print(
+            "%d shards (%s entities), %d words in %.2f sec"
+            % (n_shards, sizes, len(globalTables["dictionary"]), time.perf_counter() - start)
+        )
+    return globalTables
+
+
+# --- [2] Query workers and coordinator
+
+def _shard_worker(shard_path, connection):
+    """Worker process: load one shard, then score batches of word weights until None.
+
+    Each reply is ("ok", value), or ("error", traceback) after which the
+    worker exits: the coordinator raises it rather than waiting forever.
+    """
+    try:
+        hash_context1 = load_backend_tables_from_disk(shard_path)["hash_context1"]
+        connection.send(("ok", "ready"))
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            batch, maxResults = request
+            results = [score_entities(weights, hash_context1, maxResults) for weights in batch]
+            connection.send(("ok", results))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def merge_results(shard_results, maxResults):
+    """Global top-k from the top-k lists of the shards (entity IDs are in one shard only)."""
+    results = sorted(chain(*shard_results), key=lambda item: (-item[1], item[0]))
+    return results[:maxResults]
+
+
+class QueryCoordinator:
+    """Scatter queries to one worker process per shard, gather and merge the top results.
+
+    n_shards is read from the global tables; if given, it must match them.
+    Use as a context manager, or call close() to stop the workers.
+    """
+
+    def __init__(self, path="", n_shards=None, backendParams=None, frontendParams=None):
+        if backendParams is None:
+            backendParams = get_backend_params()
+        if frontendParams is None:
+            frontendParams = get_frontend_params()
+        self.backendParams = backendParams
+        self.frontendParams = frontendParams
+        self.globalTables = load_global_tables(path)
+        if n_shards is None:
+            n_shards = self.globalTables["n_shards"]
+        elif n_shards != self.globalTables["n_shards"]:
+            raise ValueError(
+                "tables in %r have %d shards, not %d"
+                % (path, self.globalTables["n_shards"], n_shards)
+            )
+        self.connections = []
+        self.workers = []
+        for k in range(n_shards):
+            connection, worker_connection = Pipe()
+            args = (get_shard_path(path, k), worker_connection)
+            worker = Process(target=_shard_worker, args=args, daemon=True)
+            worker.start()
+            worker_connection.close()  # so that recv() sees EOF if the worker dies
+            self.connections.append(connection)
+            self.workers.append(worker)
+        for k in range(n_shards):
+            self._receive(k)  # shard loaded
+
+    def _receive(self, k):
+        """Reply of worker k; RuntimeError (and all workers stopped) if it failed or died."""
+        connection, worker = self.connections[k], self.workers[k]
+        try:
+            while not connection.poll(POLL_SECONDS):
+                if not worker.is_alive():
+                    raise EOFError
+            status, value = connection.recv()
+            if status == "ok":
+                return value
+            error = "failed:\n" + value
+        except (EOFError, OSError):
+            worker.join(POLL_SECONDS)
+            error = "exited with code %s" % worker.exitcode
+        self.close()
+        raise RuntimeError("shard %d worker %s" % (k, error))
+
+    def process_queries(self, queries):
+        """Results of a list of queries, as process_query() would return on unsharded tables.
+
+        The batch is sent to every shard as one message before any result is
+        read, so the shards score it in parallel. (One message each way per
+        batch: with one message per query, pipes fill up and both ends block.)
+        """
+        maxResults = self.frontendParams["maxResults"]
+        batch = [
+            get_query_weights(query, self.globalTables, self.backendParams, self.frontendParams)
+            for query in queries
+        ]
+        if not self.workers:
+            raise RuntimeError("the coordinator is closed")
+        for connection in self.connections:
+            try:
+                connection.send((batch, maxResults))
+            except OSError:  # broken pipe: the worker is gone, _receive reports why
+                break
+        shard_results = [self._receive(k) for k in range(len(self.connections))]
+        return [merge_results(results, maxResults) for results in zip(*shard_results)]
+
+    def process_query(self, query):
+        return self.process_queries([query])[0]
+
+    def close(self):
+        """Stop the workers; those that do not stop within POLL_SECONDS are terminated."""
+        for connection, worker in zip(self.connections, self.workers):
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            worker.join(POLL_SECONDS)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+            connection.close()
+        self.connections = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def benchmark(path, queries, n_shards=4, repeat=20):
+    """Queries per second: one process on unsharded tables vs the coordinator on n_shards."""
+    from .processor import process_query
+
+    queries = list(queries) * repeat
+    backendTables, _ = generate_backend_tables(path=path, verbose=False)
+    start = time.perf_counter()
+    for query in queries:
+        process_query(query, backendTables)
+    elapsed = time.perf_counter() - start
+    report = {"queries": len(queries), "unsharded_qps": len(queries) / elapsed}
+    with QueryCoordinator(path, n_shards) as coordinator:
+        start = time.perf_counter()
+        coordinator.process_queries(queries)
+        report["sharded_qps"] = len(queries) / (time.perf_counter() - start)
+    return report
+
+
+if __name__ == "__main__":
+    # python -m xllm.enterprise.shards <repository directory> [n_shards] [query ...]
+    path = sys.argv[1] if len(sys.argv) > 1 else ""
+    n_shards = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    queries = sys.argv[3:] or ["data center revenue", "non-gaap gross margin", "cash flow"]
+    update_sharded_tables(path, n_shards, n_workers=n_shards)
+    report = benchmark(path, queries, n_shards)
+    print(
+        "%d queries: %.0f queries/sec unsharded, %.0f queries/sec on %d shards"
+        % (report["queries"], report["unsharded_qps"], report["sharded_qps"], n_shards)
+    )
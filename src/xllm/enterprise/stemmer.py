@@ -0,0 +1,230 @@
+"""Memoized stemming service for XLLM Enterprise.
+
+The stemmer (singularize from the pattern library) is slow, and the same
+tokens come back in every entity and every query. Stems are looked up in
+three layers:
+
+    cache     bounded LRU memo of the most recent tokens
+    stems     persistent token -> stem store: loaded from the stem cache
+              file and from hash_stem / hash_unstem, saved back to the file
+    stemmer   called once per token never seen before
+
+stem_many() deduplicates a batch of tokens before going through the layers,
+so a run of repeated tokens costs one lookup per distinct token, and the
+stemmer is only called on the distinct tokens found in no layer. For short
+runs, stem() is cheaper.
+
+write_tables() writes the stems learned this way back into hash_stem /
+hash_unstem, so that queries find them in the tables without the stemmer.
+
+Benchmark: python -m xllm.enterprise.stemmer [table directory]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from .. import xllm_util as llm
+
+CACHE_FILENAME = "backend_stem_cache.txt"
+
+
+def get_stem(token):
+    """Singular form of a token (the pattern library is only needed when use_stem is on)."""
+    from pattern.text.en import singularize
+
+    return singularize(token)
+
+
+class Stemmer:
+    """Stemming service: LRU memo, persistent stem store, then the stemmer itself."""
+
+    def __init__(self, stem_function=None, cache_size=100000, filename=None):
+        self.stem_function = stem_function if stem_function is not None else get_stem
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.stems = {}
+        self.filename = filename
+        self.n_saved = 0  # stems already in the file
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.calls = 0
+        table = llm.get_table_path(filename, "") if filename is not None else None
+        if table is not None:
+            self.load(table)
+
+    def load(self, filename):
+        """Add the stems of a stem cache file (token TAB stem per line), compressed or not."""
+        with llm.open_table(filename) as IN:
+            for line in IN:
+                line = line.rstrip("\n").split("\t")
+                if len(line) == 2:
+                    self.stems[line[0]] = line[1]
+        self.n_saved = len(self.stems)
+
+    def save(self, filename=None):
+        """Write the persistent stems to the stem cache file, if they changed."""
+        filename = filename if filename is not None else self.filename
+        if filename is None or (filename == self.filename and self.n_saved == len(self.stems)):
+            return
+        with open(filename + ".tmp", "w", encoding="utf-8") as OUT:
+            for token, stem in self.stems.items():
+                OUT.write(token + "\t" + stem + "\n")
+        os.replace(filename + ".tmp", filename)
+        if filename == self.filename:
+            self.n_saved = len(self.stems)
+
+    def merge_tables(self, hash_stem, hash_unstem):
+        """Add the stems found in the backend tables hash_stem / hash_unstem."""
+        for stem, tokens in hash_unstem.items():
+            for token in tokens:
+                self.stems.setdefault(token, stem)
+        for token, stem in hash_stem.items():
+            self.stems.setdefault(token, stem)
+
+    def write_tables(self, hash_stem, hash_unstem):
+        """Add the stems missing from hash_stem / hash_unstem; returns how many were added."""
+        added = 0
+        for token, stem in self.stems.items():
+            if token in hash_stem:
+                continue
+            unstem = hash_unstem.get(stem, ())
+            if token in unstem:
+                continue
+            if stem != token:
+                hash_stem[token] = stem
+            hash_unstem[stem] = (*unstem, token)
+            added += 1
+        return added
+
+    def _remember(self, token, stem):
+        self.cache[token] = stem
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stem(self, token):
+        """Stem of one token."""
+        if token in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(token)
+            return self.cache[token]
+        if token in self.stems:
+            self.store_hits += 1
+            stem = self.stems[token]
+        else:
+            self.misses += 1
+            self.calls += 1
+            stem = self.stem_function(token)
+            self.stems[token] = stem
+        self._remember(token, stem)
+        return stem
+
+    def stem_many(self, tokens):
+        """Stems of a list of tokens: one lookup per distinct token, one call per new token."""
+        stems = dict.fromkeys(tokens)
+        self.hits += len(tokens) - len(stems)
+        unknown = []
+        for token in stems:
+            if token in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(token)
+                stems[token] = self.cache[token]
+            elif token in self.stems:
+                self.store_hits += 1
+                stems[token] = self.stems[token]
+                self._remember(token, stems[token])
+            else:
+                unknown.append(token)
+        self.misses += len(unknown)
+        self.calls += len(unknown)
+        for token in unknown:
+            stems[token] = self.stems[token] = self.stem_function(token)
+            self._remember(token, stems[token])
+        return [stems[token] for token in tokens]
+
+    def get_stats(self):
+        lookups = self.hits + self.store_hits + self.misses
+        return {
+            "lookups": lookups,
+            "cache_hits": self.hits,
+            "store_hits": self.store_hits,
+            "stemmer_calls": self.calls,
+            "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+            "cache_size": len(self.cache),
+            "stems": len(self.stems),
+        }
+
+
+_default_stemmer = None
+
+
+def get_default_stemmer():
+    """Stemmer shared by query processing in this process (memo only, no file)."""
+    global _default_stemmer
+    if _default_stemmer is None:
+        _default_stemmer = Stemmer(cache_size=10000)
+    return _default_stemmer
+
+
+def strip_plural(token):
+    """Crude English singular, used by the benchmark when pattern is not installed."""
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses") or token.endswith("xes") or token.endswith("ches"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def get_token_stream(dictionary, n_tokens, seed=0):
+    """Tokens drawn with the frequencies of the 1-token dictionary words."""
+    words = [word for word in dictionary if "~" not in word]
+    counts = [dictionary[word] for word in words]
+    return random.Random(seed).choices(words, weights=counts, k=n_tokens)
+
+
+def benchmark(tokens, stem_function, run_length=20):
+    """Tokens per second: stemmer on every token, memoized stem(), and stem_many() on runs."""
+    report = {"tokens": len(tokens), "distinct": len(set(tokens))}
+
+    start = time.perf_counter()
+    expected = [stem_function(token) for token in tokens]
+    report["stemmer_per_sec"] = len(tokens) / (time.perf_counter() - start)
+
+    stemmer = Stemmer(stem_function)
+    start = time.perf_counter()
+    stems = [stemmer.stem(token) for token in tokens]
+    report["stem_per_sec"] = len(tokens) / (time.perf_counter() - start)
+    assert stems == expected
+
+    stemmer = Stemmer(stem_function)
+    start = time.perf_counter()
+    stems = []
+    for k in range(0, len(tokens), run_length):
+        stems.extend(stemmer.stem_many(tokens[k : k + run_length]))
+    report["stem_many_per_sec"] = len(tokens) / (time.perf_counter() - start)
+    assert stems == expected
+    report["stats"] = stemmer.get_stats()
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=path)
+    try:
+        get_stem("tests")
+        stem_function = get_stem
+    except ImportError:
+        print("pattern is not installed: benchmarking with strip_plural()")
+        stem_function = strip_plural
+    report = benchmark(get_token_stream(dictionary, 200000), stem_function)
+    print("%d tokens, %d distinct" % (report["tokens"], report["distinct"]))
+    print("stemmer every token : %10.0f tokens/sec" % report["stemmer_per_sec"])
+    print("memoized stem()     : %10.0f tokens/sec" % report["stem_per_sec"])
+    print("stem_many() on runs : %10.0f tokens/sec" % report["stem_many_per_sec"])
+    stats = report["stats"]
+    print("hit rate %.4f, %d stemmer calls" % (stats["hit_rate"], stats["stemmer_calls"]))
@@ -0,0 +1,45 @@
+"""Utility functions for XLLM Enterprise."""
+
+
+def get_value(key, hash):
+    """Value attached to key, or '' if key is not in hash."""
+    if key in hash:
+        value = hash[key]
+    else:
+        value = ""
+    return value
+
+
+def update_hash(hash, key, count=1):
+    """Add count to hash[key]; keys whose count drops to zero are removed.
+
+    A negative count subtracts a previous contribution, which is how backend
+    tables are updated incrementally.
+    """
+    if key in hash:
+        hash[key] += count
+    else:
+        hash[key] = count
+    if hash[key] == 0:
+        del hash[key]
+    return hash
+
+
+def update_nested_hash(hash, key, value, count=1):
+    """Add count to hash[key][item] for each item in value (a tuple or a single value).
+
+    Inner hashes left empty are removed.
+    """
+    if key in hash:
+        local_hash = hash[key]
+    else:
+        local_hash = {}
+    if not isinstance(value, tuple):
+        value = (value,)
+    for item in value:
+        update_hash(local_hash, item, count)
+    if local_hash:
+        hash[key] = local_hash
+    elif key in hash:
+        del hash[key]
+    return hash
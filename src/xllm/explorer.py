@@ -0,0 +1,262 @@
+"""Taxonomy explorer: the command menu of build-taxonomy/taxonomy.py as a library.
+
+The `f string` and `n integer` commands used to scan the whole dictionary on
+every call. DictionaryIndex answers them from two prebuilt structures:
+
+  - a suffix array over the dictionary keys (the words joined by a separator,
+    and the start of each suffix in sorted order), so the words containing a
+    string are one contiguous range of suffixes, found by binary search;
+  - the words sorted by count, so the words with count >= n are a prefix.
+
+A query uses whichever candidate set is cheaper: the range of suffixes, or a
+scan of the words with count >= n when the range is large compared to them
+(short or common strings, such as a single letter). It returns words by
+decreasing count. Group and connection rows (`g`, `c`) are sorted by count
+once and cached, so the `n` filter on them is also a binary search.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+SEPARATOR = "\x00"  # ends each word in the suffix array text, sorts before any character
+
+
+def get_suffix_array(words):
+    """Start positions of the suffixes of the words in their SEPARATOR-joined text, sorted.
+
+    Suffixes are ordered up to the end of their word, separator included:
+    the separators all sort before any character, and the separator of each
+    word is given its own rank, so no two suffixes compare equal past it.
+    Prefix doubling ranks the suffixes on their first 2**k characters, so
+    log2(longest word) rounds of one integer sort each. Memory is a few
+    integer arrays of the length of the text, whatever the length of the words.
+    Returns a numpy int64 array.
+    """
+    import numpy as np
+
+    text = "".join(word + SEPARATOR for word in words)
+    rank = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    n = len(rank)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    separators = rank == ord(SEPARATOR)
+    rank += len(words)
+    rank[separators] = np.arange(len(words))
+    n_ranks = n + len(words) + 0x110000 + 1  # ranks are below this, whichever the round
+    k = 1
+    while True:
+        key = rank * n_ranks  # rank of the first 2**k characters, then of the next 2**k
+        key[: n - k] += rank[k:] + 1  # + 0 past the end of the text
+        suffixes = np.argsort(key)
+        key = key[suffixes]
+        new_group = key[1:] != key[:-1]
+        del key
+        rank[suffixes[0]] = 0
+        rank[suffixes[1:]] = np.cumsum(new_group)
+        if rank[suffixes[-1]] == n - 1:
+            return suffixes
+        k *= 2
+
+
+class _Suffixes:
+    """Sequence view: suffix k of the suffix array, truncated to length m."""
+
+    def __init__(self, text, positions, m):
+        self.text = text
+        self.positions = positions
+        self.m = m
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, k):
+        position = self.positions[k]
+        return self.text[position : position + self.m]
+
+
+class DictionaryIndex:
+    """Substring and count-range index over the keys of a {word: count} dictionary."""
+
+    def __init__(self, dictionary):
+        import numpy as np
+
+        self.words = list(dictionary)
+        self.counts = [dictionary[word] for word in self.words]
+
+        # all words in one text, each followed by SEPARATOR; offsets[k] is where word k starts
+        self.text = "".join(word + SEPARATOR for word in self.words)
+        lengths = np.array([len(word) + 1 for word in self.words], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        self.offsets = array("q", offsets.tobytes())
+        suffixes = get_suffix_array(self.words)
+        is_separator = np.zeros(len(self.text), dtype=bool)
+        is_separator[offsets + lengths - 1] = True
+        suffixes = suffixes[~is_separator[suffixes]]  # suffixes of the words only
+        self.positions = array("q", suffixes.tobytes())
+
+        # word IDs by decreasing count (ties by word); ascending negated counts for bisect
+        order = sorted(range(len(self.words)), key=lambda k: (-self.counts[k], self.words[k]))
+        self.words_by_count = [self.words[k] for k in order]
+        self.counts_by_count = [self.counts[k] for k in order]
+        self.negated_counts = array("q", [-count for count in self.counts_by_count])
+
+    def count_at_least(self, min_count):
+        """Number of words with count >= min_count."""
+        return bisect_right(self.negated_counts, -min_count)
+
+    def find(self, string, min_count=0):
+        """Words containing string with count >= min_count, as [(count, word)], highest first."""
+        n_frequent = self.count_at_least(min_count)
+        if SEPARATOR in string:
+            return []
+        view = _Suffixes(self.text, self.positions, len(string))
+        low = bisect_left(view, string)
+        high = bisect_right(view, string, low)
+
+        if 16 * (high - low) <= n_frequent:
+            # few matching suffixes: collect their words, then sort by count
+            word_IDs = set(
+                bisect_right(self.offsets, position) - 1 for position in self.positions[low:high]
+            )
+            found = [
+                (self.counts[k], self.words[k]) for k in word_IDs if self.counts[k] >= min_count
+            ]
+            found.sort(key=lambda item: (-item[0], item[1]))
+            return found
+        # short or common string: scan the frequent words, already in count order
+        return [
+            (count, word)
+            for count, word in zip(self.counts_by_count[:n_frequent], self.words_by_count)
+            if string in word
+        ]
+
+    def at_least(self, min_count):
+        """Words with count >= min_count, as [(count, word)], highest first."""
+        n_frequent = self.count_at_least(min_count)
+        return list(zip(self.counts_by_count[:n_frequent], self.words_by_count))
+
+
+class Explorer:
+    """State and commands of the taxonomy explorer menu."""
+
+    def __init__(
+        self,
+        dictionary,
+        smallDictionary,
+        topWords,
+        wordGroups,
+        connectedByTopWord,
+        connectedTopWords,
+    ):
+        self.dictionary = dictionary
+        self.topWords = dict(sorted(topWords.items(), key=lambda item: item[0]))
+        self.wordGroups = wordGroups
+        self.connectedByTopWord = connectedByTopWord
+        self.connectedTopWords = connectedTopWords
+        self.indexes = {"short": DictionaryIndex(smallDictionary)}
+        self.smallDictionary = smallDictionary
+        self.dict_mode = "short"
+        self.n = 0  # return entries with count >= n
+        self.rows = {}  # cached count-sorted rows of g and c
+
+    def get_index(self):
+        if self.dict_mode not in self.indexes:  # full dictionary index: built on first use
+            self.indexes[self.dict_mode] = DictionaryIndex(self.dictionary)
+        return self.indexes[self.dict_mode]
+
+    def menu(self):
+        # option 'l' useful to check if topWordA, topWordB are connected or not
+        # option 'c' shows all topWordB connected to topWordA = topWord
+        return [
+            "Command line menu: \n",
+            "<Enter>                 - exit",
+            "h                       - help: show menu options",
+            "a                       - show all top words",
+            "ds                      - select short dictionary",
+            "df                      - select full dictionary",
+            "n integer               - display entries with count >= integer",
+            "f string                - find string in dictionary",
+            "g topWord               - print groupWords[topWord]",
+            "c topWord               - print connectedByTopWord[topWord]",
+            "l topWordA topWordB     - (topWordA, topWordB) connections count\n",
+            "current settings: n = %3d, dictionary = %s" % (self.n, self.dict_mode),
+            "",
+        ]
+
+    def find(self, string):
+        """f string: entries of the current dictionary containing string, count >= n."""
+        found = self.get_index().find(string, self.n)
+        return ["%s %s %s" % (count, string, word) for count, word in found]
+
+    def get_rows(self, command, topWord):
+        """Rows of g or c for topWord as [(count used by n, line)], sorted by decreasing count."""
+        key = (command, topWord)
+        if key not in self.rows:
+            countA = self.dictionary[topWord]
+            rows = []
+            if command == "g":
+                for word in self.wordGroups[topWord]:
+                    countB = self.dictionary[word]
+                    rows.append((countB, "%s %s %s %s" % (countA, countB, topWord, word)))
+            else:
+                hash = self.connectedByTopWord[topWord]
+                for word in hash:
+                    countB = self.dictionary[word]
+                    countAB = hash[word]
+                    line = "%s %s %s %s %s" % (countA, countB, countAB, topWord, word)
+                    rows.append((countAB, line))
+            rows.sort(key=lambda row: -row[0])
+            self.rows[key] = (array("q", [-row[0] for row in rows]), [row[1] for row in rows])
+        negated_counts, lines = self.rows[key]
+        return lines[: bisect_right(negated_counts, -self.n)]
+
+    def group(self, topWord):
+        """g topWord: words of wordGroups[topWord] with count >= n."""
+        if topWord not in self.wordGroups:
+            return ["topWord not in wordGroups"]
+        return self.get_rows("g", topWord)
+
+    def connected(self, topWord):
+        """c topWord: connectedByTopWord[topWord] entries with connection count >= n."""
+        if topWord not in self.connectedByTopWord:
+            return ["topWord not in wordGroups"]
+        return self.get_rows("c", topWord)
+
+    def link(self, string):
+        """l topWordA topWordB: number of connections between two top words."""
+        astring = string.split(" ")
+        if len(astring) == 1:
+            return ["needs 2 topWords, space-separated"]
+        key = (astring[0], astring[1])
+        return ["%s %s" % (self.connectedTopWords.get(key, 0), key)]
+
+    def execute(self, query):
+        """Run one menu command; returns the lines to display."""
+        queries = query.split(" ")
+        action = queries[0]
+        if len(queries) > 2:
+            queries[1] = queries[1] + " " + queries[2]
+
+        if action == "h":
+            return self.menu()
+        elif action == "ds":
+            self.dict_mode = "short"
+        elif action == "df":
+            self.dict_mode = "full"
+        elif action == "a":
+            return ["%s %s" % (self.topWords[topWord], topWord) for topWord in self.topWords] + [""]
+        elif action in ("f", "g", "c", "l", "n") and len(queries) > 1:
+            string = queries[1]
+            if action == "n":
+                self.n = int(string)
+            elif action == "f":
+                return self.find(string) + [""]
+            elif action == "g":
+                return self.group(string) + [""]
+            elif action == "c":
+                return self.connected(string) + [""]
+            elif action == "l":
+                return self.link(string)
+        elif action != "":
+            return ["Missing arguments"]
+        return []
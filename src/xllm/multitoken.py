@@ -0,0 +1,157 @@
+"""Multitoken lookup for query expansion.
+
+A word is 1 to max_multitoken tokens joined by '~', and ngrams tables map the
+sorted tokens of a word ('analysis~bayesian') to the orderings observed when
+crawling ('bayesian~analysis', ...). Finding every word made of query tokens by
+probing the tables with each combination of tokens costs sum C(n, k) probes
+(and k! orderings each) for an n-token query, almost all of them misses.
+
+MultitokenIndex stores the sorted tokens of every word in a trie instead. A
+single depth-first traversal over the sorted query tokens only follows
+branches that exist, so the work is proportional to the number of matching
+words, not to the number of token combinations.
+
+Benchmark on long queries: python -m xllm.multitoken [table directory]
+"""
+
+import random
+import sys
+import time
+from itertools import combinations, permutations
+
+from . import xllm_util as llm
+
+WORDS = None  # key of the trie node payload: the words ending at this node
+
+
+class MultitokenIndex:
+    """Trie on the sorted tokens of dictionary words and ngram variants."""
+
+    def __init__(self, dictionary, ngrams_table=None):
+        self.root = {}
+        self.size = 0
+        for word in dictionary:
+            self.add(word.split("~"), word)
+        if ngrams_table is not None:
+            for key, variants in ngrams_table.items():
+                for variant in variants:
+                    self.add(key.split("~"), variant)
+
+    def add(self, tokens, word):
+        node = self.root
+        for token in sorted(tokens):
+            if token not in node:
+                node[token] = {}
+            node = node[token]
+        words = node.setdefault(WORDS, [])
+        if word not in words:
+            words.append(word)
+            self.size += 1
+
+    def lookup(self, tokens, max_tokens=None):
+        """Words made of query tokens, as {sorted tokens '~'-joined: (words...)}.
+
+        Each query token is used at most once per word (repeated query tokens can
+        be used as many times as they appear). max_tokens limits the number of
+        tokens per word, like max_multitoken in the backend.
+        """
+        tokens = sorted(tokens)
+        if max_tokens is None:
+            max_tokens = len(tokens)
+        results = {}
+        path = []
+
+        def traverse(node, start):
+            for k in range(start, len(tokens)):
+                token = tokens[k]
+                if k > start and token == tokens[k - 1]:
+                    continue  # same branch as the previous, identical token
+                child = node.get(token)
+                if child is None:
+                    continue
+                path.append(token)
+                if WORDS in child:
+                    results["~".join(path)] = tuple(child[WORDS])
+                if len(path) < max_tokens:
+                    traverse(child, k + 1)
+                path.pop()
+
+        traverse(self.root, 0)
+        return results
+
+    def get_words(self, tokens, max_tokens=None):
+        """Flat list of the words made of query tokens."""
+        words = []
+        for variants in self.lookup(tokens, max_tokens).values():
+            words.extend(variants)
+        return words
+
+
+# --- Benchmark against combinatorial probing
+
+def probe_combinations(tokens, dictionary, ngrams_table, max_tokens):
+    """Reference lookup: probe the tables with every combination of query tokens."""
+    results = {}
+    for n in range(1, min(max_tokens, len(tokens)) + 1):
+        for combination in combinations(sorted(tokens), n):
+            key = "~".join(combination)
+            words = []
+            for variant in ngrams_table.get(key, ()):
+                if variant not in words:
+                    words.append(variant)
+            for ordering in set(permutations(combination)):
+                word = "~".join(ordering)
+                if word in dictionary and word not in words:
+                    words.append(word)
+            if words:
+                results[key] = words
+    return results
+
+
+def benchmark(dictionary, ngrams_table, query_sizes=(5, 10, 20, 40), n_queries=5, seed=0):
+    """Time per query of the trie traversal vs combinatorial probing (max 4 tokens)."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    index = MultitokenIndex(dictionary, ngrams_table)
+    report = {"build_sec": time.perf_counter() - start, "words": index.size}
+    multitoken_words = [word.split("~") for word in dictionary if "~" in word]
+
+    for size in query_sizes:
+        queries = []
+        for _ in range(n_queries):
+            query = []
+            while len(query) < size:
+                query.extend(rng.choice(multitoken_words))
+            queries.append(query[:size])
+
+        start = time.perf_counter()
+        found = [index.lookup(query, max_tokens=4) for query in queries]
+        trie_time = (time.perf_counter() - start) / n_queries
+        start = time.perf_counter()
+        expected = [probe_combinations(query, dictionary, ngrams_table, 4) for query in queries]
+        probe_time = (time.perf_counter() - start) / n_queries
+
+        for results, reference in zip(found, expected):
+            assert set(results) == set(reference)
+        report[size] = {
+            "trie_ms": 1000 * trie_time,
+            "probe_ms": 1000 * probe_time,
+            "keys_found": sum(len(r) for r in found) / n_queries,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=path)
+    ngrams_table = llm.read_table("xllm_compressed_ngrams_table.txt", type="list", path=path)
+    report = benchmark(dictionary, ngrams_table)
+    print("index of %d words built in %.2f sec" % (report["words"], report["build_sec"]))
+    print("tokens   trie (ms)   probing (ms)   keys found")
+    for size in report:
+        if isinstance(size, int):
+            item = report[size]
+            print(
+                "%6d %11.3f %14.3f %12.1f"
+                % (size, item["trie_ms"], item["probe_ms"], item["keys_found"])
+            )
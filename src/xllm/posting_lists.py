@@ -0,0 +1,161 @@
+"""Compact posting lists for url_map.
+
+url_map attaches to each word the URL IDs where it is found, with counts. In
+the text table this is {word: {'url_ID': count}}; here all postings share
+three flat arrays: row offsets, URL IDs (sorted within each row) and counts.
+A word's posting list is a zero-copy view on its slice of these arrays, so
+there are no per-entry dicts, string keys or int() casts when scoring.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from . import xllm_util as llm
+
+
+class PostingList:
+    """Sorted URL IDs of a word, with parallel counts."""
+
+    __slots__ = ("url_IDs", "counts")
+
+    def __init__(self, url_IDs=None, counts=None):
+        self.url_IDs = url_IDs if url_IDs is not None else array("I")
+        self.counts = counts if counts is not None else array("I")
+
+    def __len__(self):
+        return len(self.url_IDs)
+
+    def __iter__(self):
+        """Iterate over (url_ID, count)."""
+        return zip(self.url_IDs, self.counts)
+
+    def __contains__(self, url_ID):
+        k = bisect_left(self.url_IDs, url_ID)
+        return k < len(self.url_IDs) and self.url_IDs[k] == url_ID
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def get(self, url_ID, default=0):
+        """Count attached to url_ID."""
+        k = bisect_left(self.url_IDs, url_ID)
+        if k < len(self.url_IDs) and self.url_IDs[k] == url_ID:
+            return self.counts[k]
+        return default
+
+    def to_hash(self):
+        """Same posting list in the text table format: {'url_ID': count}."""
+        return {str(url_ID): count for url_ID, count in self}
+
+
+class PostingLists(Mapping):
+    """Read-only {word: PostingList}, all postings stored in three flat arrays."""
+
+    def __init__(self):
+        self.rows = {}  # word -> row
+        self.offsets = array("Q", [0])
+        self.url_IDs = array("I")
+        self.counts = array("I")
+
+    def add(self, word, postings):
+        """Append the posting list of a new word; postings is an iterable of (url_ID, count)."""
+        if word in self.rows:
+            raise KeyError("duplicate word: %s" % word)
+        postings = sorted(postings)
+        self.url_IDs.extend([url_ID for url_ID, _ in postings])
+        self.counts.extend([count for _, count in postings])
+        self.rows[word] = len(self.offsets) - 1
+        self.offsets.append(len(self.url_IDs))
+
+    @classmethod
+    def from_table(cls, url_map):
+        """Build from the {word: {'url_ID': count}} format returned by read_table()."""
+        posting_lists = cls()
+        for word, url_hash in url_map.items():
+            posting_lists.add(word, ((int(url_ID), count) for url_ID, count in url_hash.items()))
+        return posting_lists
+
+    def __getitem__(self, word):
+        row = self.rows[word]
+        start, end = self.offsets[row], self.offsets[row + 1]
+        url_IDs = memoryview(self.url_IDs)[start:end]
+        counts = memoryview(self.counts)[start:end]
+        return PostingList(url_IDs, counts)
+
+    def __contains__(self, word):
+        return word in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def read_url_map(filename, path=llm.url):
+    """Read xllm_url_map.txt directly into PostingLists."""
+    posting_lists = PostingLists()
+    for line in llm.get_data(filename, path):
+        line = line.split("\t")
+        if len(line) > 1:
+            items = line[1].replace("'", "").strip("{}").replace(": ", ", ").split(", ")
+            if items == [""]:
+                items = []
+            url_IDs = map(int, items[0::2])
+            counts = map(int, items[1::2])
+            posting_lists.add(line[0], zip(url_IDs, counts))
+    return posting_lists
+
+
+# --- Intersection and union (numpy: only needed by these helpers)
+
+def _to_numpy(posting_list):
+    import numpy as np
+
+    url_IDs = np.frombuffer(posting_list.url_IDs, dtype=np.uint32)
+    counts = np.frombuffer(posting_list.counts, dtype=np.uint32).astype(np.int64)
+    return url_IDs, counts
+
+
+def _from_numpy(url_IDs, counts):
+    import numpy as np
+
+    result = PostingList()
+    result.url_IDs.frombytes(url_IDs.astype(np.uint32).tobytes())
+    result.counts.frombytes(counts.astype(np.uint32).tobytes())
+    return result
+
+
+def intersect(*posting_lists):
+    """URL IDs found in all posting lists, with counts summed."""
+    import numpy as np
+
+    if not posting_lists:
+        return PostingList()
+    url_IDs, counts = _to_numpy(posting_lists[0])
+    for posting_list in posting_lists[1:]:
+        other_IDs, other_counts = _to_numpy(posting_list)
+        url_IDs, rows, other_rows = np.intersect1d(
+            url_IDs, other_IDs, assume_unique=True, return_indices=True
+        )
+        counts = counts[rows] + other_counts[other_rows]
+    return _from_numpy(url_IDs, counts)
+
+
+def union(*posting_lists):
+    """URL IDs found in any posting list, with counts summed."""
+    import numpy as np
+
+    if not posting_lists:
+        return PostingList()
+    arrays = [_to_numpy(posting_list) for posting_list in posting_lists]
+    url_IDs, inverse = np.unique(np.concatenate([a[0] for a in arrays]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([a[1] for a in arrays]))
+    return _from_numpy(url_IDs, counts.astype(np.int64))
+
+
+def get_urls(posting_list, arr_url, max_urls=None):
+    """URLs of a posting list as [(url, count)], highest counts first."""
+    postings = sorted(posting_list, key=lambda item: item[1], reverse=True)
+    return [(arr_url[url_ID], count) for url_ID, count in postings[:max_urls]]
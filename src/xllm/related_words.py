@@ -0,0 +1,304 @@
+"""Precomputed related-words graph from word_hash and compressed_word2_hash.
+
+Both tables attach to a word the words found next to it, with co-occurrence
+counts, and some rows hold thousands of entries. Instead of pulling and
+sorting a raw row for every query word, an offline stage keeps the top_n
+neighbors of each word, ranked by count or PMI, in three flat arrays:
+
+    offsets[k] : offsets[k + 1]   slice of word k in neighbor_IDs and weights
+    neighbor_IDs                  neighbor word IDs, best first
+    weights                       float32 weights, decreasing within a slice
+
+The graph is saved to a binary cache file, reused as long as the build
+parameters and the source tables are unchanged. Queries slice the arrays:
+related words of a word, or a k-hop expansion of a set of query words.
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+from array import array
+
+from . import xllm_util as llm
+
+MAGIC = b"XLLMREL1"
+CACHE_FILENAME = "xllm_related_words.bin"
+SOURCES = ("xllm_word_hash.txt", "xllm_compressed_word2_hash.txt")
+WEIGHTINGS = ("count", "pmi")
+
+
+def get_weight(count_AB, count_A, count_B, total, weighting):
+    """Weight of the edge A -> B: co-occurrence count, or pointwise mutual information."""
+    if weighting == "count":
+        return float(count_AB)
+    return math.log(count_AB * total / (count_A * count_B))
+
+
+def merge_rows(hash_tables):
+    """Sum the co-occurrence counts of several {word: {word: count}} tables."""
+    merged = {}
+    for hash_table in hash_tables:
+        for word, hash in hash_table.items():
+            row = merged.setdefault(word, {})
+            for neighbor, count in hash.items():
+                if neighbor != word:
+                    row[neighbor] = row.get(neighbor, 0) + count
+    return merged
+
+
+class RelatedWords:
+    """Pruned neighbor graph: top related words of each word, stored as flat arrays."""
+
+    def __init__(self, words, offsets, neighbor_IDs, weights, params=None):
+        self.words = words
+        self.word_IDs = {word: k for k, word in enumerate(words)}
+        self.offsets = offsets
+        self.neighbor_IDs = neighbor_IDs
+        self.weights = weights
+        self.params = params or {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_IDs
+
+    def neighbors(self, word, top_n=None):
+        """[(neighbor, weight)] of word, best first; [] for unknown words."""
+        if word not in self.word_IDs:
+            return []
+        k = self.word_IDs[word]
+        start, end = self.offsets[k], self.offsets[k + 1]
+        if top_n is not None:
+            end = min(end, start + top_n)
+        words = self.words
+        return [
+            (words[neighbor_ID], weight)
+            for neighbor_ID, weight in zip(self.neighbor_IDs[start:end], self.weights[start:end])
+        ]
+
+    def expand(self, words, hops=1, top_n=5, max_words=None):
+        """k-hop related-word expansion of a list of query words.
+
+        Follows the top_n neighbors of each word reached at the previous hop.
+        Returns [(word, hop, weight)] for the words found, excluding the query
+        words, sorted by hop then decreasing weight; weight is the best edge
+        leading to the word at the hop where it was first reached.
+        """
+        seen = set(words)
+        frontier = [self.word_IDs[word] for word in words if word in self.word_IDs]
+        found = []
+        for hop in range(1, hops + 1):
+            best = {}
+            for k in frontier:
+                start = self.offsets[k]
+                end = min(self.offsets[k + 1], start + top_n)
+                neighbors = zip(self.neighbor_IDs[start:end], self.weights[start:end])
+                for neighbor_ID, weight in neighbors:
+                    if self.words[neighbor_ID] in seen:
+                        continue
+                    if weight > best.get(neighbor_ID, -math.inf):
+                        best[neighbor_ID] = weight
+            reached = sorted(best.items(), key=lambda item: -item[1])
+            for neighbor_ID, weight in reached:
+                word = self.words[neighbor_ID]
+                seen.add(word)
+                found.append((word, hop, weight))
+            frontier = [neighbor_ID for neighbor_ID, _ in reached]
+            if not frontier or (max_words is not None and len(found) >= max_words):
+                break
+        return found[:max_words] if max_words is not None else found
+
+    def save(self, filename):
+        """Write the graph to a binary cache file."""
+        header = json.dumps({"params": self.params, "words": self.words}).encode("utf-8")
+        with open(filename, "wb") as OUT:
+            OUT.write(MAGIC)
+            OUT.write(len(header).to_bytes(8, "little"))
+            OUT.write(header)
+            for values in (self.offsets, self.neighbor_IDs, self.weights):
+                OUT.write(len(values).to_bytes(8, "little"))
+                OUT.write(values.tobytes())
+
+    @classmethod
+    def load(cls, filename):
+        """Read a graph written by save()."""
+        with open(filename, "rb") as IN:
+            if IN.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a related-words file" % filename)
+            header = json.loads(IN.read(int.from_bytes(IN.read(8), "little")))
+            sections = []
+            for typecode in ("I", "I", "f"):
+                values = array(typecode)
+                values.frombytes(IN.read(values.itemsize * int.from_bytes(IN.read(8), "little")))
+                sections.append(values)
+        return cls(header["words"], *sections, params=header["params"])
+
+
+def build_related_words(hash_tables, dictionary, top_n=20, weighting="count", min_count=1):
+    """Build the pruned graph from co-occurrence tables (offline stage).
+
+    Args:
+        hash_tables: list of {word: {word: count}} tables, e.g. word_hash and
+            compressed_word2_hash; counts of the same pair are summed
+        dictionary: {word: count}, for PMI; pairs with a word missing from the
+            dictionary are skipped when weighting = 'pmi'
+        top_n: neighbors kept per word
+        weighting: 'count' or 'pmi'
+        min_count: minimum co-occurrence count of a pair (PMI overrates rare pairs)
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError("weighting must be one of %s" % (WEIGHTINGS,))
+    merged = merge_rows(hash_tables)
+    total = sum(dictionary.values())
+
+    words = list(merged)
+    word_IDs = {word: k for k, word in enumerate(words)}
+    rows = []
+    for word in words:
+        count_A = dictionary.get(word, 0)
+        row = []
+        for neighbor, count_AB in merged[word].items():
+            if count_AB < min_count:
+                continue
+            count_B = dictionary.get(neighbor, 0)
+            if weighting == "pmi" and (count_A == 0 or count_B == 0):
+                continue
+            row.append((get_weight(count_AB, count_A, count_B, total, weighting), neighbor))
+        row.sort(key=lambda item: (-item[0], item[1]))
+        rows.append(row[:top_n])
+
+    for row in rows:  # neighbors without a row of their own still need an ID
+        for _, neighbor in row:
+            if neighbor not in word_IDs:
+                word_IDs[neighbor] = len(words)
+                words.append(neighbor)
+
+    offsets = array("I", [0])
+    neighbor_IDs = array("I")
+    weights = array("f")
+    for row in rows:
+        neighbor_IDs.extend(word_IDs[neighbor] for _, neighbor in row)
+        weights.extend(weight for weight, _ in row)
+        offsets.append(len(neighbor_IDs))
+    offsets.extend([len(neighbor_IDs)] * (len(words) - len(rows)))
+
+    params = {"top_n": top_n, "weighting": weighting, "min_count": min_count}
+    return RelatedWords(words, offsets, neighbor_IDs, weights, params)
+
+
+def get_sources_signature(path):
+    """[file, size, mtime] of each local source table, plain or compressed.
+
+    None when path is a URL or no source table is found locally: there is
+    nothing to check a cache against. A missing table has a None entry.
+    """
+    if "http" in path:
+        return None
+    signature = []
+    for filename in SOURCES:
+        table_path = llm.get_table_path(filename, path)
+        if table_path is None:
+            signature.append(None)
+        else:
+            status = os.stat(table_path)
+            signature.append([os.path.basename(table_path), status.st_size, status.st_mtime_ns])
+    return signature if any(signature) else None
+
+
+def load_related_words(
+    path=llm.DATA_PATH,
+    cache=CACHE_FILENAME,
+    top_n=20,
+    weighting="count",
+    min_count=1,
+    verbose=False,
+):
+    """Related-words graph from the cache file, rebuilt from the tables in path if stale.
+
+    The cache is rebuilt when it is missing, or when top_n, weighting,
+    min_count or the size / modification time of the local source tables
+    differ from the ones it was built with. When the sources are remote or
+    not found, an existing cache built with the same parameters is used.
+    """
+    params = {
+        "top_n": top_n,
+        "weighting": weighting,
+        "min_count": min_count,
+        "sources": get_sources_signature(path),
+    }
+    if os.path.exists(cache):
+        graph = RelatedWords.load(cache)
+        cache_params = graph.params
+        if params["sources"] is None:
+            cache_params = dict(cache_params, sources=None)
+        if cache_params == params:
+            return graph
+    if verbose:
+        print("building related-words cache %s" % cache)
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=path)
+    hash_tables = [llm.read_table(filename, type="hash", path=path) for filename in SOURCES]
+    graph = build_related_words(hash_tables, dictionary, top_n, weighting, min_count)
+    graph.params = params
+    graph.save(cache)
+    return graph
+
+
+def sort_raw_row(word, hash_tables, dictionary, total, top_n, weighting):
+    """Baseline: related words of a word by sorting its raw co-occurrence rows at query time."""
+    row = merge_rows([{word: hash_table[word]} for hash_table in hash_tables if word in hash_table])
+    count_A = dictionary.get(word, 0)
+    ranked = []
+    for neighbor, count_AB in row.get(word, {}).items():
+        count_B = dictionary.get(neighbor, 0)
+        if weighting == "count" or (count_A > 0 and count_B > 0):
+            ranked.append((get_weight(count_AB, count_A, count_B, total, weighting), neighbor))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked[:top_n]
+
+
+def benchmark(hash_tables, dictionary, top_n=20, weighting="count", n_queries=200, seed=0):
+    """Time per query word of the precomputed graph vs sorting raw rows."""
+    start = time.perf_counter()
+    graph = build_related_words(hash_tables, dictionary, top_n, weighting)
+    report = {
+        "build_sec": time.perf_counter() - start,
+        "words": len(graph),
+        "edges": len(graph.weights),
+    }
+    rows = sorted(set().union(*hash_tables))
+    queries = random.Random(seed).sample(rows, min(n_queries, len(rows)))
+    total = sum(dictionary.values())
+
+    start = time.perf_counter()
+    for word in queries:
+        graph.neighbors(word)
+    report["graph_us"] = 1e6 * (time.perf_counter() - start) / len(queries)
+    start = time.perf_counter()
+    for word in queries:
+        sort_raw_row(word, hash_tables, dictionary, total, top_n, weighting)
+    report["raw_us"] = 1e6 * (time.perf_counter() - start) / len(queries)
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=path)
+    hash_tables = [llm.read_table(filename, type="hash", path=path) for filename in SOURCES]
+    for weighting in WEIGHTINGS:
+        report = benchmark(hash_tables, dictionary, weighting=weighting)
+        print(
+            "%s: %d words, %d edges, built in %.2f sec; "
+            "%.1f us per word vs %.1f us sorting raw rows"
+            % (
+                weighting,
+                report["words"],
+                report["edges"],
+                report["build_sec"],
+                report["graph_us"],
+                report["raw_us"],
+            )
+        )
@@ -0,0 +1,220 @@
+"""Fast spelling correction against the XLLM dictionary.
+
+The index follows SymSpell: every 1-token dictionary word is stored under all
+strings obtained by deleting up to max_distance characters from its prefix.
+At query time the same deletes are generated for the misspelled token, and
+only the words sharing a delete are checked with a true edit distance. Ties
+are broken by dictionary count, so the domain vocabulary wins over generic
+English. Unlike a general-purpose speller, a token is only ever corrected to
+a word of our dictionary (backend dictionary for the enterprise version).
+
+Benchmark against autocorrect: python -m xllm.spelling [table directory]
+"""
+
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from . import xllm_util as llm
+
+
+def get_distance(a, b, max_distance):
+    """Optimal string alignment distance between a and b, or max_distance + 1 if larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # a typo usually touches one spot: drop the common prefix and suffix first
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start : len(a) - end]
+    b = b[start : len(b) - end]
+    if a == "" or b == "":
+        return min(len(a) + len(b), max_distance + 1)
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            value = previous[j - 1] if a[i - 1] == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                if previous2[j - 2] + 1 < value:
+                    value = previous2[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return min(previous[len(b)], max_distance + 1)
+
+
+def get_deletes(word, max_distance):
+    """All strings obtained by deleting 1 to max_distance characters from word."""
+    deletes = set()
+    level = {word}
+    for _ in range(max_distance):
+        next_level = set()
+        for item in level:
+            if len(item) > 1:
+                for k in range(len(item)):
+                    next_level.add(item[:k] + item[k + 1 :])
+        deletes |= next_level
+        level = next_level
+    return deletes
+
+
+class SpellingIndex:
+    """Deletion-neighborhood index over the 1-token words of a dictionary."""
+
+    def __init__(self, dictionary, max_distance=2, prefix_length=7, cache_size=10000):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.words = {}  # 1-token word -> count
+        self.deletes = {}  # delete -> tuple of words
+        for word, count in dictionary.items():
+            if "~" not in word and word != "":
+                self.words[word] = count
+        for word in self.words:
+            prefix = word[: self.prefix_length]
+            for delete in get_deletes(prefix, max_distance) | {prefix}:
+                self.deletes[delete] = (*self.deletes.get(delete, ()), word)
+
+    def lookup(self, token, max_distance=None, closest=False):
+        """In-vocabulary candidates for token, as [(word, distance, count)], best first.
+
+        With closest=True, only candidates at the smallest distance are returned;
+        the search stops as soon as deleting more characters cannot beat them.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        if token in self.words:
+            return [(token, 0, self.words[token])]
+
+        prefix = token[: self.prefix_length]
+        results = []
+        checked = set()
+        level = {prefix}
+        for n_deletes in range(max_distance + 1):
+            if closest and results and n_deletes > results[0][1]:
+                break
+            for candidate in level:
+                for word in self.deletes.get(candidate, ()):
+                    if word not in checked:
+                        checked.add(word)
+                        distance = get_distance(token, word, max_distance)
+                        if distance <= max_distance:
+                            results.append((word, distance, self.words[word]))
+                            if closest and distance < max_distance:
+                                max_distance = distance
+            results.sort(key=lambda item: (item[1], -item[2], item[0]))
+            level = {c[:k] + c[k + 1 :] for c in level if len(c) > 1 for k in range(len(c))}
+        if closest:
+            results = [item for item in results if item[1] == results[0][1]]
+        return results
+
+    def correct(self, token):
+        """Best in-vocabulary correction of token, or token itself if there is none."""
+        if token in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(token)
+            return self.cache[token]
+        self.misses += 1
+        results = self.lookup(token, closest=True)
+        correction = results[0][0] if results else token
+        self.cache[token] = correction
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return correction
+
+    def correct_query(self, query, stopwords=()):
+        """Correct each token of a query; stopwords and numbers are left unchanged."""
+        tokens = []
+        for token in query.lower().split():
+            if token not in stopwords and not token.isdigit():
+                token = self.correct(token)
+            tokens.append(token)
+        return " ".join(tokens)
+
+    def get_stats(self):
+        calls = self.hits + self.misses
+        return {
+            "words": len(self.words),
+            "deletes": len(self.deletes),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "hit_rate": self.hits / calls if calls else 0.0,
+        }
+
+
+# --- Benchmark against the autocorrect path
+
+def get_misspellings(words, n, seed=0):
+    """(misspelled, correct) pairs: one random insert, delete, swap or replace per word."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = sorted(word for word in words if len(word) > 3 and word.isalpha())
+    pairs = []
+    for word in rng.sample(words, min(n, len(words))):
+        k = rng.randrange(len(word) - 1)
+        edit = rng.choice(("insert", "delete", "swap", "replace"))
+        if edit == "insert":
+            typo = word[:k] + rng.choice(letters) + word[k:]
+        elif edit == "delete":
+            typo = word[:k] + word[k + 1 :]
+        elif edit == "swap":
+            typo = word[:k] + word[k + 1] + word[k] + word[k + 2 :]
+        else:
+            typo = word[:k] + rng.choice(letters) + word[k + 1 :]
+        pairs.append((typo, word))
+    return pairs
+
+
+def benchmark(dictionary, n=500, speller=None):
+    """Time and accuracy of SpellingIndex vs autocorrect on random misspellings."""
+    start = time.perf_counter()
+    index = SpellingIndex(dictionary)
+    build_time = time.perf_counter() - start
+    pairs = get_misspellings(index.words, n)
+
+    if speller is None:
+        from autocorrect import Speller
+
+        speller = Speller(lang="en")
+    report = {"build_sec": build_time}
+    for name, correct in (("xllm", index.correct), ("autocorrect", speller)):
+        start = time.perf_counter()
+        corrections = [correct(typo) for typo, _ in pairs]
+        seconds = time.perf_counter() - start
+        accuracy = sum(c == word for c, (_, word) in zip(corrections, pairs)) / len(pairs)
+        report[name] = {"usec_per_token": 1e6 * seconds / len(pairs), "accuracy": accuracy}
+
+    start = time.perf_counter()
+    for typo, _ in pairs:
+        index.correct(typo)
+    report["xllm_cached"] = {"usec_per_token": 1e6 * (time.perf_counter() - start) / len(pairs)}
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path=path)
+    report = benchmark(dictionary)
+    print("index built in %.2f sec" % report["build_sec"])
+    for name in ("xllm", "xllm_cached", "autocorrect"):
+        item = report[name]
+        print("%-12s %8.1f usec/token" % (name, item["usec_per_token"]), end="")
+        print("  accuracy %.3f" % item["accuracy"] if "accuracy" in item else "")
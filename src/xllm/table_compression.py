@@ -0,0 +1,170 @@
+"""Compressed table storage for XLLM.
+
+Tables are tab-separated text, and compress well. A table can be stored as
+filename.gz (gzip, standard library) or filename.zst (zstd, needs the
+zstandard package). llm.get_data() reads filename, or filename.zst /
+filename.gz when there is no text file, and streams the lines as they are
+decompressed, so read_table(), read_arr_url(), read_dictionary() and the
+enterprise loaders work unchanged on compressed directories.
+
+Tables are still written as text: the text file wins over a compressed copy,
+so a table rewritten after compress_directory() is not shadowed by a stale
+copy (compress the directory again to refresh it).
+
+Benchmark: python -m xllm.table_compression [table directory]
+"""
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from . import xllm_util as llm
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+CHUNK_SIZE = 1 << 20
+
+
+def get_codecs():
+    """Codecs available here: gzip always, zstd if zstandard is installed."""
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return ("gzip",)
+    return ("gzip", "zstd")
+
+
+def compress_file(filename, codec="gzip", level=None, output=None, remove=False):
+    """Compress one table file into filename + .gz / .zst (or output); returns the output name."""
+    if output is None:
+        output = filename + SUFFIXES[codec]
+    with open(filename, "rb") as IN, open(output + ".tmp", "wb") as OUT:
+        if codec == "gzip":
+            with gzip.GzipFile(fileobj=OUT, mode="wb", compresslevel=level or 9, mtime=0) as writer:
+                shutil.copyfileobj(IN, writer, CHUNK_SIZE)
+        elif codec == "zstd":
+            import zstandard
+
+            compressor = zstandard.ZstdCompressor(level=level or 19)
+            compressor.copy_stream(IN, OUT, read_size=CHUNK_SIZE)
+        else:
+            raise ValueError("unknown codec %r, expected one of %s" % (codec, sorted(SUFFIXES)))
+    os.replace(output + ".tmp", output)
+    if remove:
+        os.remove(filename)
+    return output
+
+
+def compress_directory(
+    path, codec="gzip", level=None, output_path=None, remove=False, verbose=True
+):
+    """Compress the .txt tables of a directory.
+
+    Args:
+        output_path: directory for the compressed tables (default: next to the tables)
+        remove: delete each text file once it is compressed
+
+    Returns:
+        {filename: (text bytes, compressed bytes)}
+    """
+    output_path = path if output_path is None else output_path
+    sizes = {}
+    for filename in sorted(os.listdir(path or ".")):
+        if not filename.endswith(".txt"):
+            continue
+        raw_size = os.path.getsize(path + filename)
+        output = compress_file(
+            path + filename, codec, level, output_path + filename + SUFFIXES[codec], remove
+        )
+        sizes[filename] = (raw_size, os.path.getsize(output))
+        if verbose:
+            print("%-36s %10d -> %10d bytes" % (filename, *sizes[filename]))
+    return sizes
+
+
+def get_load_time(name, path, repeat=3):
+    """Best time to read one XLLM table with compile_xllm_tables(), in seconds."""
+    from .table_store import compile_xllm_tables
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compile_xllm_tables(path, names=[name])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def get_text_tables(path, directory, names):
+    """{name: directory holding the text file of the table}, for the tables in path.
+
+    A table found only compressed in path is decompressed into directory.
+    """
+    from .table_store import XLLM_TABLES
+
+    sources = {}
+    for name in names:
+        filename = XLLM_TABLES[name][0]
+        table_path = llm.get_table_path(filename, path)
+        if table_path is None:
+            continue
+        if table_path == path + filename:
+            sources[name] = path
+        else:
+            with llm.open_table(table_path) as IN, open(
+                directory + filename, "w", encoding="utf-8"
+            ) as OUT:
+                shutil.copyfileobj(IN, OUT, CHUNK_SIZE)
+            sources[name] = directory
+    return sources
+
+
+def benchmark(path=llm.DATA_PATH, codecs=None, repeat=3):
+    """Disk bytes and load time of the XLLM tables, as text and with each codec.
+
+    The tables are compressed into a temporary directory; path is not modified.
+    Tables stored compressed in path are measured from a decompressed copy.
+    Returns {name: {"text": (bytes, sec), codec: (bytes, sec), ...}}.
+    """
+    from .table_store import XLLM_TABLES
+
+    codecs = get_codecs() if codecs is None else codecs
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        directory += "/"
+        sources = get_text_tables(path, directory, XLLM_TABLES)
+        for name, source in sources.items():
+            size = os.path.getsize(source + XLLM_TABLES[name][0])
+            report[name] = {"text": (size, get_load_time(name, source, repeat))}
+        for codec in codecs:
+            output_path = directory + codec + "/"
+            os.mkdir(output_path)
+            for name, source in sources.items():
+                filename = XLLM_TABLES[name][0]
+                output = output_path + filename + SUFFIXES[codec]
+                compress_file(source + filename, codec, output=output)
+                load_time = get_load_time(name, output_path, repeat)
+                report[name][codec] = (os.path.getsize(output), load_time)
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else llm.DATA_PATH
+    report = benchmark(path)
+    formats = list(next(iter(report.values())))
+    print("%-24s" % "table" + "".join("%22s" % format for format in formats))
+    totals = {format: [0, 0.0] for format in formats}
+    for name, results in report.items():
+        line = "%-24s" % name
+        for format in formats:
+            size, seconds = results[format]
+            totals[format][0] += size
+            totals[format][1] += seconds
+            line += "%11.0f KB %6.3f s" % (size / 1024, seconds)
+        print(line)
+    line = "%-24s" % "total"
+    for size, seconds in totals.values():
+        line += "%11.0f KB %6.3f s" % (size / 1024, seconds)
+    print(line)
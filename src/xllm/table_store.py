@@ -0,0 +1,402 @@
+"""Shared, read-only table store for XLLM query workers.
+
+Tables are compiled once into a single flat buffer: one deduplicated string
+pool plus, for each table, arrays of string IDs, row offsets and values. The
+buffer is published either as a file (attached with mmap, so every worker maps
+the same page-cache pages) or as a multiprocessing.shared_memory block.
+Attaching only parses a small JSON header, so it takes milliseconds, and the
+per-host memory footprint is one copy of the tables however many workers run.
+
+Attached tables are read-only Mapping / Sequence views: lookups go through a
+per-table open-addressing hash index on the raw bytes of the key, and nested
+hashes are decoded into a fresh dict for the row that is accessed.
+
+Supported tables (this covers the XLLM tables and most enterprise tables):
+
+    {str: int}, {str: float}, {str: str}
+    {str: {str: int}}, {str: {str: float}}
+    {str: tuple of str}
+    list or tuple of str
+"""
+
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+
+from . import xllm_util as llm
+
+MAGIC = b"XLLMTBL1"
+ALIGN = 8
+
+TYPECODES = {"int": "q", "float": "d", "str": "I"}
+
+# name: (filename, type, format) of the XLLM tables compiled by compile_xllm_tables()
+XLLM_TABLES = {
+    "dictionary": ("xllm_dictionary.txt", "dictionary", None),
+    "arr_url": ("xllm_arr_url.txt", "arr_url", None),
+    "stopwords": ("stopwords.txt", "stopwords", None),
+    "url_map": ("xllm_url_map.txt", "hash", "int"),
+    "hash_category": ("xllm_hash_category.txt", "hash", "int"),
+    "hash_see": ("xllm_hash_see.txt", "hash", "int"),
+    "word_hash": ("xllm_word_hash.txt", "hash", "int"),
+    "compressed_word2_hash": ("xllm_compressed_word2_hash.txt", "hash", "int"),
+    "embeddings": ("xllm_embeddings.txt", "hash", "float"),
+    "ngrams_table": ("xllm_ngrams_table.txt", "list", None),
+    "compressed_ngrams_table": ("xllm_compressed_ngrams_table.txt", "list", None),
+}
+
+
+# --- [1] Compile tables into a flat buffer
+
+def get_kind(table):
+    """Kind of a table: 'array', 'int', 'float', 'str', 'hash_int', 'hash_float' or 'list'."""
+    if isinstance(table, (list, tuple)):
+        return "array"
+    kinds = set()
+    for key, value in table.items():
+        if not isinstance(key, str):
+            raise TypeError("table keys must be str, got %r" % (key,))
+        if isinstance(value, bool):
+            raise TypeError("unsupported value %r" % (value,))
+        elif isinstance(value, int):
+            kinds.add("int")
+        elif isinstance(value, float):
+            kinds.add("float")
+        elif isinstance(value, str):
+            kinds.add("str")
+        elif isinstance(value, tuple):
+            kinds.add("list")
+        elif isinstance(value, dict):
+            inner = set(type(item) for item in value.values())
+            kinds.add("hash_float" if float in inner else "hash_int")
+        else:
+            raise TypeError("unsupported value %r" % (value,))
+    if kinds <= {"int", "float"} and "float" in kinds:
+        kinds = {"float"}
+    if kinds <= {"hash_int", "hash_float"} and "hash_float" in kinds:
+        kinds = {"hash_float"}
+    if len(kinds) > 1:
+        raise TypeError("mixed value types in table: %s" % sorted(kinds))
+    return kinds.pop() if kinds else "int"
+
+
+class _Builder:
+    """Collect strings and arrays, then lay them out in one buffer."""
+
+    def __init__(self):
+        self.string_IDs = {}
+        self.strings = []
+        self.sections = []  # arrays, referenced by position in the table headers
+
+    def get_string_ID(self, string):
+        if string not in self.string_IDs:
+            self.string_IDs[string] = len(self.strings)
+            self.strings.append(string)
+        return self.string_IDs[string]
+
+    def add_section(self, values):
+        self.sections.append(values)
+        return len(self.sections) - 1
+
+    def add_index(self, key_IDs):
+        """Open-addressing hash index on key bytes: slot -> row + 1 (0 = empty)."""
+        n_slots = 8
+        while n_slots < 2 * len(key_IDs):
+            n_slots *= 2
+        slots = array("I", bytes(4 * n_slots))
+        mask = n_slots - 1
+        for row, key_ID in enumerate(key_IDs):
+            slot = zlib.crc32(self.strings[key_ID].encode("utf-8")) & mask
+            while slots[slot] != 0:
+                slot = (slot + 1) & mask
+            slots[slot] = row + 1
+        return self.add_section(slots)
+
+    def add_table(self, table):
+        kind = get_kind(table)
+        header = {"kind": kind}
+        if kind == "array":
+            header["items"] = self.add_section(array("I", map(self.get_string_ID, table)))
+            return header
+
+        key_IDs = array("I", map(self.get_string_ID, table))
+        header["keys"] = self.add_section(key_IDs)
+        header["index"] = self.add_index(key_IDs)
+        if kind in TYPECODES:
+            if kind == "str":
+                values = array("I", map(self.get_string_ID, table.values()))
+            else:
+                values = array(TYPECODES[kind], table.values())
+            header["values"] = self.add_section(values)
+        else:
+            offsets = array("Q", [0])
+            items = array("I")
+            values = array("d" if kind == "hash_float" else "q")
+            for value in table.values():
+                items.extend(map(self.get_string_ID, value))
+                if kind != "list":
+                    values.extend(value.values())
+                offsets.append(len(items))
+            header["offsets"] = self.add_section(offsets)
+            header["items"] = self.add_section(items)
+            if kind != "list":
+                header["values"] = self.add_section(values)
+        return header
+
+    def to_bytes(self, tables_header):
+        encoded = [string.encode("utf-8") for string in self.strings]
+        string_offsets = array("Q", [0])
+        for item in encoded:
+            string_offsets.append(string_offsets[-1] + len(item))
+        pool = b"".join(encoded)
+        sections = [string_offsets, array("B", pool)] + self.sections
+
+        layout = []
+        position = 0
+        for values in sections:
+            layout.append((position, values.typecode, len(values)))
+            position += values.itemsize * len(values)
+            position += -position % ALIGN
+        header = json.dumps({"sections": layout, "tables": tables_header}).encode("utf-8")
+        start = len(MAGIC) + 8 + len(header)
+        start += -start % ALIGN
+
+        buffer = bytearray(start + position)
+        buffer[: len(MAGIC)] = MAGIC
+        struct.pack_into("<Q", buffer, len(MAGIC), len(header))
+        buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + len(header)] = header
+        for (offset, _, _), values in zip(layout, sections):
+            data = values.tobytes()
+            buffer[start + offset : start + offset + len(data)] = data
+        return bytes(buffer)
+
+
+def compile_tables(tables):
+    """Compile {name: table} into the bytes of a table store."""
+    builder = _Builder()
+    tables_header = {}
+    for name, table in tables.items():
+        tables_header[name] = builder.add_table(table)
+    return builder.to_bytes(tables_header)
+
+
+def compile_xllm_tables(path=llm.DATA_PATH, names=None):
+    """Read the XLLM tables found in path, as {name: table}."""
+    tables = {}
+    for name in names if names is not None else XLLM_TABLES:
+        filename, type, format = XLLM_TABLES[name]
+        if type == "dictionary":
+            tables[name] = llm.read_dictionary(filename, path=path)
+        elif type == "arr_url":
+            tables[name] = llm.read_arr_url(filename, path=path)
+        elif type == "stopwords":
+            tables[name] = llm.read_stopwords(filename, path=path)
+        else:
+            tables[name] = llm.read_table(filename, type=type, format=format, path=path)
+    return tables
+
+
+# --- [2] Publish and attach
+
+def publish_tables(tables, filename):
+    """Write the compiled tables to filename; workers attach with attach_tables(filename)."""
+    with open(filename, "wb") as file:
+        file.write(compile_tables(tables))
+
+
+def publish_shared_tables(tables, name=None):
+    """Copy the compiled tables into a new shared memory block.
+
+    The caller owns the block: keep the returned SharedMemory object alive while
+    workers run, then call close() and unlink() on it.
+    """
+    from multiprocessing import shared_memory
+
+    data = compile_tables(tables)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    shm.buf[: len(data)] = data
+    return shm
+
+
+class TableStore(Mapping):
+    """Read-only view of a compiled table store: {name: table view}."""
+
+    def __init__(self, buffer, owner=None):
+        self._owner = owner  # mmap or SharedMemory that must outlive the views
+        self._views = [memoryview(buffer)]
+        self._views.append(self._views[0].toreadonly())
+        buffer = self._views[1]
+        if bytes(buffer[: len(MAGIC)]) != MAGIC:
+            raise ValueError("not an XLLM table store")
+        (header_size,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(buffer[start : start + header_size]))
+        start += header_size
+        start += -start % ALIGN
+
+        self._sections = []
+        for offset, typecode, length in header["sections"]:
+            size = array(typecode).itemsize * length
+            section = buffer[start + offset : start + offset + size]
+            self._views.append(section)
+            if typecode != "B":
+                section = section.cast(typecode)
+                self._views.append(section)
+            self._sections.append(section)
+        self._strings = _StringPool(self._sections[0], self._sections[1])
+        del self._sections[:2]  # table headers index the sections that follow the pool
+        self._headers = header["tables"]
+        self._tables = {}
+
+    def __getitem__(self, name):
+        if name not in self._tables:
+            header = self._headers[name]
+            if header["kind"] == "array":
+                table = SharedArray(self._strings, self._sections[header["items"]])
+            else:
+                table = SharedTable(self._strings, header, self._sections)
+            self._tables[name] = table
+        return self._tables[name]
+
+    def __iter__(self):
+        return iter(self._headers)
+
+    def __len__(self):
+        return len(self._headers)
+
+    def close(self):
+        """Release the views and the underlying buffer."""
+        self._tables = {}
+        self._sections = []
+        self._strings = None
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+
+def attach_tables(filename=None, name=None):
+    """Attach read-only to tables published as a file (filename) or in shared memory (name)."""
+    if filename is not None:
+        with open(filename, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return TableStore(buffer, owner=buffer)
+
+    from multiprocessing import shared_memory
+
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # the publisher owns the block: before 3.13 attaching registers it with the
+        # resource tracker, which would unlink it when this worker exits
+        from multiprocessing import resource_tracker
+
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    return TableStore(shm.buf, owner=shm)
+
+
+# --- [3] Table views
+
+class _StringPool:
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def get_bytes(self, string_ID):
+        return self.data[self.offsets[string_ID] : self.offsets[string_ID + 1]]
+
+    def get_string(self, string_ID):
+        return str(self.get_bytes(string_ID), "utf-8")
+
+
+class SharedArray(Sequence):
+    """Read-only list of strings, e.g. arr_url or stopwords."""
+
+    def __init__(self, strings, items):
+        self._strings = strings
+        self._items = items
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._strings.get_string(item) for item in self._items[position]]
+        return self._strings.get_string(self._items[position])
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SharedTable(Mapping):
+    """Read-only {str: value} table; nested hashes are returned as new dicts."""
+
+    def __init__(self, strings, header, sections):
+        self.kind = header["kind"]
+        self._strings = strings
+        self._keys = sections[header["keys"]]
+        self._slots = sections[header["index"]]
+        self._mask = len(self._slots) - 1
+        self._values = sections[header["values"]] if "values" in header else None
+        self._offsets = sections[header["offsets"]] if "offsets" in header else None
+        self._items = sections[header["items"]] if "items" in header else None
+
+    def _get_row(self, key):
+        if not isinstance(key, str):
+            return -1
+        key = key.encode("utf-8")
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            row = self._slots[slot]
+            if row == 0:
+                return -1
+            if self._strings.get_bytes(self._keys[row - 1]) == key:
+                return row - 1
+            slot = (slot + 1) & self._mask
+
+    def _get_value(self, row):
+        kind = self.kind
+        if kind == "int" or kind == "float":
+            return self._values[row]
+        elif kind == "str":
+            return self._strings.get_string(self._values[row])
+        get_string = self._strings.get_string
+        start, end = self._offsets[row], self._offsets[row + 1]
+        items = self._items[start:end]
+        if kind == "list":
+            return tuple(get_string(item) for item in items)
+        return dict(zip(map(get_string, items), self._values[start:end]))
+
+    def __getitem__(self, key):
+        row = self._get_row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._get_value(row)
+
+    def __contains__(self, key):
+        return self._get_row(key) >= 0
+
+    def __iter__(self):
+        get_string = self._strings.get_string
+        for key_ID in self._keys:
+            yield get_string(key_ID)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+if __name__ == "__main__":
+    # python -m xllm.table_store [table directory] [output file]
+    args = sys.argv[1:]
+    path = args[0] if args else llm.DATA_PATH
+    output = args[1] if len(args) > 1 else "xllm_tables.bin"
+    publish_tables(compile_xllm_tables(path), output)
+    print("tables from %s published to %s" % (path, output))
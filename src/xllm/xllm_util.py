@@ -1,5 +1,143 @@
 """Utility functions for XLLM."""
 
+import gzip
+import io
+import os
+
 DATA_PATH = "../../data/xllm/"
 
-url = "https://raw.githubusercontent.com/VincentGranville/Large-Language-Models/main/xllm/" 
\ No newline at end of file
+url = "https://raw.githubusercontent.com/VincentGranville/Large-Language-Models/main/xllm/"
+
+
+# --- Functions to read the tables
+
+def text_to_hash(string, format="int"):
+    string = string.replace("'", "").split(", ")
+    hash = {}
+    for word in string:
+        word = word.replace("{", "").replace("}", "")
+        if word != "":
+            word = word.split(": ")
+            value = word[1]
+            if format == "int":
+                value = int(value)
+            elif format == "float":
+                value = float(value)
+            hash[word[0]] = value
+    return hash
+
+
+def text_to_list(string):
+    if ", " in string:
+        string = string.replace("'", "").split(", ")
+    else:
+        string = string.replace("'", "").split(",")
+    list = ()
+    for word in string:
+        word = word.replace("(", "").replace(")", "")
+        if word != "":
+            list = (*list, word)
+    return list
+
+
+# compressed copies of a table: filename + suffix, tried in this order
+COMPRESSED_SUFFIXES = (".zst", ".gz")
+
+
+def get_table_path(filename, path):
+    """Local file holding a table: the text file, else its .zst or .gz copy (None if missing)."""
+    for suffix in ("",) + COMPRESSED_SUFFIXES:
+        if os.path.exists(path + filename + suffix):
+            return path + filename + suffix
+    return None
+
+
+def open_table(filename):
+    """Text stream of a local table file, decompressed on the fly if it ends with .zst or .gz."""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt", encoding="utf-8")
+    if filename.endswith(".zst"):
+        import zstandard  # optional, only needed for .zst tables
+
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(filename, "r", encoding="utf-8")
+
+
+def decompress_stream(stream, filename):
+    """Text stream of a binary stream, decompressed on the fly if filename ends with .zst or .gz."""
+    if filename.endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif filename.endswith(".zst"):
+        import zstandard
+
+        stream = zstandard.ZstdDecompressor().stream_reader(stream)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def get_data(filename, path):
+    """Lines of a table (trailing whitespace removed), one at a time.
+
+    Local tables are streamed from the text file, or from filename.zst /
+    filename.gz if there is no text file, without reading the whole file.
+    Remote tables (or their .zst / .gz copy) are streamed as they download.
+    """
+    if "http" in path:
+        import requests  # slow to import, only needed for remote tables
+
+        response = requests.get(path + filename, stream=True)
+        if response.status_code == 404:
+            for suffix in COMPRESSED_SUFFIXES:
+                compressed = requests.get(path + filename + suffix, stream=True)
+                if compressed.status_code == 200:
+                    response.close()
+                    response, filename = compressed, filename + suffix
+                    break
+                compressed.close()
+        with response:
+            response.raw.decode_content = True  # undo the HTTP content encoding, if any
+            for line in decompress_stream(response.raw, filename):
+                yield line.rstrip()
+    else:
+        table_path = get_table_path(filename, path)
+        with open_table(table_path if table_path is not None else path + filename) as file:
+            for line in file:
+                yield line.rstrip()
+
+
+def read_table(filename, type, format="int", path=url):
+    table = {}
+    data = get_data(filename, path)
+    for line in data:
+        line = line.split("\t")
+        if len(line) > 1:
+            if type == "hash":
+                table[line[0]] = text_to_hash(line[1], format)
+            elif type == "list":
+                table[line[0]] = text_to_list(line[1])
+    return table
+
+
+def read_arr_url(filename, path=url):
+    arr_url = []
+    data = get_data(filename, path)
+    for line in data:
+        line = line.split("\t")
+        if len(line) > 1:
+            arr_url.append(line[1])
+    return arr_url
+
+
+def read_dictionary(filename, path=url):
+    dictionary = {}
+    data = get_data(filename, path)
+    for line in data:
+        line = line.split("\t")
+        if len(line) > 1:
+            dictionary[line[0]] = int(line[1])
+    return dictionary
+
+
+def read_stopwords(filename, path=url):
+    data = get_data(filename, path)
+    return text_to_list(next(data))
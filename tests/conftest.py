@@ -51,6 +51,17 @@ def create_test_file(test_data_dir):
     return _create_file
 
 
+@pytest.fixture
+def write_repository():
+    """Write entity lines (ID~~{field::text||...}) to a repository file in a directory."""
+
+    def _write_repository(path, lines, filename="repository.txt"):
+        with open(path + filename, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    return _write_repository
+
+
 @pytest.fixture
 def temp_file():
     """
@@ -1,14 +1,92 @@
 """Tests for backend module."""
 
-import pytest
+import os
+import random
+
 from xllm.enterprise.backend import (
+    attach_backend_tables,
     generate_backend_tables,
     load_backend_tables,
     load_backend_tables_from_disk,
+    publish_backend_tables,
+    read_manifest,
+    update_backend_tables,
 )
+from xllm.enterprise.config import TABLE_NAMES, get_backend_params
+from xllm.enterprise.processor import process_query
+
 
 def test_backend():
     """Test backend module."""
     assert generate_backend_tables is not None
     assert load_backend_tables is not None
-    assert load_backend_tables_from_disk is not None 
\ No newline at end of file
+    assert load_backend_tables_from_disk is not None 
+
+
+def test_incremental_update(test_data_dir, write_repository):
+    """Test that an incremental update gives the same tables as a full rebuild."""
+    path = test_data_dir + "/"
+    lines = [
+        "B0X0~~{title::Revenue||description::Data Center revenue was a record}",
+        "B1X0~~{title::Revenue||description::Gaming revenue was down}",
+        "B2X0~~{title::Non-GAAP||description::Non-GAAP gross margin and income tax}",
+    ]
+    write_repository(path, lines)
+    update_backend_tables(path, verbose=False)
+
+    lines[1] = "B1X0~~{title::Revenue||description::Gaming revenue was up}"
+    del lines[2]
+    lines.append("B3X1~~{title::Cash||description::Cash flow from operations}")
+    lines.append("B4X0~~{title::Tax||description::Income tax expense}")
+    write_repository(path, lines)
+    backendTables = update_backend_tables(path, verbose=False)
+    full, manifest = generate_backend_tables(path=path, verbose=False)
+
+    assert read_manifest(path) == manifest
+    assert load_backend_tables_from_disk(path) == backendTables
+    for name in TABLE_NAMES:
+        assert backendTables[name] == full[name]
+    assert "non-gaap" not in backendTables["dictionary"]
+    assert backendTables["dictionary"]["revenue"] == 4  # titles count too
+    # the deleted Non-GAAP section (0, 1) is reused by the new Tax section, as in a full build
+    assert backendTables["ID_to_index"] == {
+        "B0X0": (0, 0), "B1X0": (0, 0), "B3X1": (1, 0), "B4X0": (0, 1),
+    }
+    assert backendTables["ID_to_agents"]["B3X1"] == ("Cash",)
+
+
+def test_update_rewrites_changed_tables(test_data_dir, write_repository, capsys):
+    """Test that an update without changes parses no entity and rewrites no table."""
+    path = test_data_dir + "/"
+    rng = random.Random(0)
+    vocabulary = ["word%d" % k for k in range(500)]
+    write_repository(path, [
+        "B%dX%d~~{title::Title %d||description::%s}"
+        % (k, k % 5, k % 20, " ".join(rng.choices(vocabulary, k=30)))
+        for k in range(200)
+    ])
+    backendParams = dict(get_backend_params(), dedup=False)
+    update_backend_tables(path, backendParams, verbose=False)
+    mtimes = {name: os.stat(path + "backend_" + name + ".pkl").st_mtime_ns for name in TABLE_NAMES}
+
+    capsys.readouterr()
+    backendTables = update_backend_tables(path, backendParams, verbose=True)
+    assert capsys.readouterr().out.startswith("0 added, 0 changed, 0 deleted, 200 unchanged")
+    full, _ = generate_backend_tables(backendParams, path=path, verbose=False)
+    for name in TABLE_NAMES:
+        assert backendTables[name] == full[name]
+        assert os.stat(path + "backend_" + name + ".pkl").st_mtime_ns == mtimes[name]
+
+
+def test_attached_tables(test_data_dir, write_repository):
+    """Test that queries on attached tables match queries on the tables in memory."""
+    path = test_data_dir + "/"
+    write_repository(path, [
+        "B0X0~~{title::Revenue||description::Data Center revenue was a record}",
+        "B1X0~~{title::Revenue||description::Gaming revenue was down}",
+    ])
+    backendTables, _ = generate_backend_tables(path=path, verbose=False)
+    publish_backend_tables(backendTables, path + "tables.bin")
+    attached = attach_backend_tables(path + "tables.bin")
+    query = "data center revenue"
+    assert process_query(query, attached) == process_query(query, backendTables)
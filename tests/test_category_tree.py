@@ -0,0 +1,103 @@
+"""Tests for the category hierarchy index."""
+
+import numpy as np
+
+from xllm.category_tree import CategoryTree, get_external_taxonomy, parse_category_item
+
+HASH_CATEGORY = {
+    "bayesian": {
+        "Bayesian Analysis | Bayesian Analysis  | 3": 7,
+        "Maximum Likelihood | Estimators  | 3": 1,
+    },
+    "estimator": {"Estimators | Statistics  | 2": 2, "Unbiased Estimator | Estimators  | 3": 1},
+    "probability": {"Probability | Statistics  | 2": 1},
+}
+
+
+def get_tree():
+    return CategoryTree.from_hash_category(HASH_CATEGORY)
+
+
+def test_parse():
+    """Test that items are parsed once into the same tables as taxonomy.py."""
+    item = parse_category_item("Maximum Likelihood | Estimators  | 3")
+    assert item == ("maximum~likelihood", "estimators", 3)
+    categories, parent_categories = get_external_taxonomy(HASH_CATEGORY)
+    assert parent_categories["unbiased~estimator"] == "estimators"
+    tree = get_tree()
+    assert dict(zip(tree.names, tree.levels)) == categories
+    assert len(tree) == 6
+
+
+def test_ancestors_and_subtrees():
+    """Test ancestor lookup and subtree membership."""
+    tree = get_tree()
+    ancestors = tree.get_ancestors("maximum~likelihood")
+    assert ancestors == ["maximum~likelihood", "estimators", "statistics"]
+    assert tree.get_parent("statistics") is None
+    assert tree.get_parent("bayesian~analysis") is None  # self-parent
+    assert tree.get_ancestor("unbiased~estimator", 1) == "estimators"
+    assert tree.get_ancestor("estimators", 2) == "estimators"
+    assert tree.is_in_subtree("unbiased~estimator", "statistics")
+    assert tree.is_in_subtree("estimators", "estimators")
+    assert not tree.is_in_subtree("statistics", "estimators")
+    assert not tree.is_in_subtree("bayesian~analysis", "statistics")
+    subtree = sorted(tree.get_subtree("estimators"))
+    assert subtree == ["estimators", "maximum~likelihood", "unbiased~estimator"]
+
+
+def test_cycle():
+    """Test that an edge closing a cycle is dropped."""
+    tree = CategoryTree({"a": 1, "b": 2}, {"a": "b", "b": "a"})
+    assert tree.get_ancestors("a") == ["a", "b"]
+    assert tree.get_parent("b") is None
+
+
+def test_rollup():
+    """Test vectorized subtree totals against a brute-force sum."""
+    tree = get_tree()
+    scores = np.random.default_rng(0).random((4, len(tree)))
+    totals = tree.rollup(scores)
+    for name in tree.names:
+        node = tree.node_IDs[name]
+        subtree = [tree.node_IDs[other] for other in tree.names if tree.is_in_subtree(other, name)]
+        assert np.allclose(totals[:, node], scores[:, subtree].sum(axis=1))
+
+
+def test_best_categories():
+    """Test the top category per URL, with and without rollup."""
+    tree = get_tree()
+    pair_scores = {
+        (0, "maximum~likelihood"): 2.0,
+        (0, "unbiased~estimator"): 2.0,
+        (0, "bayesian~analysis"): 3.0,
+        (1, "probability"): 1.0,
+        (1, "unknown"): 5.0,
+    }
+    # on their own score, categories missing from the tree are kept
+    assert tree.get_best_categories(pair_scores) == {
+        0: ("bayesian~analysis", 3.0),
+        1: ("unknown", 5.0),
+    }
+    assert tree.get_best_categories(pair_scores, depth=0) == {
+        0: ("statistics", 4.0),
+        1: ("statistics", 1.0),
+    }
+    assert tree.get_best_categories(pair_scores, depth=1)[0] == ("estimators", 4.0)
+
+
+def test_best_categories_ties():
+    """Test that ties go to the category seen first, and row keys keep their order."""
+    tree = get_tree()
+    pair_scores = {
+        (5, "unbiased~estimator"): 2.0,
+        (2, "probability"): 1.0,
+        (5, "maximum~likelihood"): 2.0,
+        (2, "estimators"): 1.0,
+    }
+    best = tree.get_best_categories(pair_scores)
+    assert list(best.items()) == [(5, ("unbiased~estimator", 2.0)), (2, ("probability", 1.0))]
+    assert tree.get_best_categories(pair_scores, depth=1) == {
+        5: ("estimators", 4.0),
+        2: ("probability", 1.0),  # tied with estimators, seen first
+    }
@@ -0,0 +1,84 @@
+"""Tests for near-duplicate entity detection."""
+
+from xllm.enterprise.backend import generate_backend_tables, update_backend_tables
+from xllm.enterprise.config import STOPWORDS, get_backend_params
+from xllm.enterprise.dedup import (
+    CACHE_FILENAME,
+    Signatures,
+    compare_dedup,
+    find_duplicates,
+    get_shingles,
+)
+
+BOILERPLATE = (
+    "Non-GAAP gross margin excludes stock-based compensation, acquisition-related costs, "
+    "IP-related costs, other costs and the tax effect of these items reconciled in table %d"
+)
+
+
+def get_lines():
+    lines = ["B%dX0~~{title::Non-GAAP||description::%s}" % (k, BOILERPLATE % k) for k in range(6)]
+    lines.append("B6X0~~{title::Revenue||description::Data Center revenue was a record}")
+    lines.append("B7X0~~{title::Revenue||description::Gaming revenue was down}")
+    return lines
+
+
+def test_find_duplicates():
+    """Test that near-identical entities cluster on the first one, and others do not."""
+    entities = dict(line.split("~~") for line in get_lines())
+    duplicates = find_duplicates(entities, STOPWORDS)
+    assert duplicates == {"B0X0": ("B1X0", "B2X0", "B3X0", "B4X0", "B5X0")}
+    assert find_duplicates(entities, STOPWORDS, threshold=1.0) == {}
+    assert len(get_shingles(entities["B7X0"], STOPWORDS)) == 3  # revenue gaming revenue was down
+
+
+def test_signatures(test_data_dir):
+    """Test that stored signatures are reused, and only new contents are MinHashed."""
+    filename = test_data_dir + "/" + CACHE_FILENAME
+    entities = dict(line.split("~~") for line in get_lines())
+    signatures = Signatures(STOPWORDS, filename=filename)
+    duplicates = find_duplicates(entities, STOPWORDS, signatures=signatures)
+    assert signatures.computed == len(entities)
+    signatures.save()
+
+    entities["B7X0"] = "{title::Revenue||description::Gaming revenue was up}"
+    signatures = Signatures(STOPWORDS, filename=filename)
+    assert find_duplicates(entities, STOPWORDS, signatures=signatures) == duplicates
+    assert signatures.computed == 1
+    assert Signatures(STOPWORDS, shingle_size=2, filename=filename).entries == {}
+
+
+def test_dedup_tables(test_data_dir, write_repository):
+    """Test that only canonical entities are indexed, incrementally too."""
+    path = test_data_dir + "/"
+    lines = get_lines()
+    write_repository(path, lines)
+    params = dict(get_backend_params(), dedup=True)
+    backendTables, _ = generate_backend_tables(params, path=path, verbose=False)
+    assert sorted(backendTables["ID_to_content"]) == ["B0X0", "B6X0", "B7X0"]
+    assert list(backendTables["hash_context1"]["non-gaap"]) == ["B0X0"]
+    assert backendTables["ID_to_duplicates"]["B0X0"][0] == "B1X0"
+
+    update_backend_tables(path, params, verbose=False)
+    lines[0] = "B0X0~~{title::Cash||description::Cash flow from operations}"
+    write_repository(path, lines)
+    backendTables = update_backend_tables(path, params, verbose=False)
+    full, _ = generate_backend_tables(params, path=path, verbose=False)
+    assert sorted(backendTables["ID_to_content"]) == ["B0X0", "B1X0", "B6X0", "B7X0"]
+    for name in ("dictionary", "hash_pairs", "hash_context1", "ID_to_agents", "ID_to_duplicates"):
+        assert backendTables[name] == full[name]
+
+    backendTables = update_backend_tables(path, verbose=False)  # dedup is off by default
+    assert len(backendTables["ID_to_content"]) == len(lines)
+    assert backendTables["ID_to_duplicates"] == {}
+
+
+def test_compare_dedup(test_data_dir, write_repository):
+    """Test the size reduction and retrieval comparison."""
+    path = test_data_dir + "/"
+    write_repository(path, get_lines())
+    report = compare_dedup(["non-gaap gross margin", "gaming revenue"], path=path, verbose=False)
+    assert report["dedup_sizes"]["ID_to_content"] == 3
+    assert report["sizes"]["ID_to_content"] == 8
+    assert report["reduction"] > 0.1
+    assert report["overlap"] == {"non-gaap gross margin": 1.0, "gaming revenue": 1.0}
@@ -0,0 +1,98 @@
+"""Tests for the compact embedding store."""
+
+import numpy as np
+import pytest
+
+from xllm.embedding_store import (
+    EmbeddingStore,
+    compile_embeddings,
+    evaluate,
+    get_correlation,
+    get_rank_correlation,
+    prune_row,
+)
+
+EMBEDDINGS = {
+    "bayesian": {"analysis": 21.8, "inference": 12.1, "crime": 9.8, "data": 4.9},
+    "analysis": {"bayesian": 21.8, "cluster": 19.8, "data": 4.2, "function": -0.3},
+    "inference": {"bayesian": 12.1, "data": 3.5, "statistical": 2.0},
+    "cluster": {"analysis": 19.8, "data": 8.0},
+    "crime": {"bayesian": 9.8},
+}
+
+
+def test_prune_row():
+    """Test top-k and threshold pruning."""
+    row = EMBEDDINGS["analysis"]
+    assert prune_row(row, top_k=2) == [("bayesian", 21.8), ("cluster", 19.8)]
+    expected = [("bayesian", 21.8), ("cluster", 19.8), ("data", 4.2)]
+    assert prune_row(row, threshold=0.0) == expected
+
+
+@pytest.mark.parametrize(
+    "dtype, tolerance", [("float64", 0), ("float32", 1e-5), ("float16", 2e-3), ("int8", 1e-2)]
+)
+def test_quantization(dtype, tolerance):
+    """Test that dequantized rows are close to the original ones."""
+    store = compile_embeddings(EMBEDDINGS, dtype=dtype)
+    assert list(store) == list(EMBEDDINGS)
+    for word, hash in EMBEDDINGS.items():
+        row = store[word]
+        assert set(row) == set(hash)
+        peak = max(abs(weight) for weight in hash.values())
+        for token, weight in hash.items():
+            assert abs(row[token] - weight) <= tolerance * peak
+
+
+def test_save_load(tmp_path):
+    """Test the binary file round trip."""
+    store = compile_embeddings(EMBEDDINGS, dtype="int8", top_k=3)
+    store.save(str(tmp_path / "embeddings.bin"))
+    loaded = EmbeddingStore.load(str(tmp_path / "embeddings.bin"))
+    assert loaded.params == {"dtype": "int8", "top_k": 3, "threshold": None}
+    assert dict(loaded) == dict(store)
+    assert loaded.nearest("bayesian", 2) == store.nearest("bayesian", 2)
+
+
+def test_nearest():
+    """Test cosine nearest neighbors against a dense computation."""
+    store = compile_embeddings(EMBEDDINGS, dtype="float64")
+    tokens = sorted(set(token for hash in EMBEDDINGS.values() for token in hash))
+    dense = np.array([[hash.get(token, 0.0) for token in tokens] for hash in EMBEDDINGS.values()])
+    dense /= np.linalg.norm(dense, axis=1)[:, None]
+    expected = dense @ dense[0]
+    assert np.allclose(store.similarities("bayesian"), expected)
+    ranked = [list(EMBEDDINGS)[row] for row in np.argsort(-expected)[1:3]]
+    assert [word for word, _ in store.nearest("bayesian", 2)] == ranked
+
+
+def test_evaluate():
+    """Test the evaluation harness."""
+    assert get_correlation(np.array([1.0, 2.0, 3.0]), np.array([10.0, 20.0, 30.0])) == 1.0
+    x, y = np.array([1.0, 2.0, 3.0]), np.array([10.0, 20.0, 25.0])
+    assert get_rank_correlation(x, y) == pytest.approx(1.0)
+    assert get_rank_correlation(np.array([1.0, 1.0, 2.0]), np.array([1.0, 2.0, 3.0])) < 1.0
+    reports = evaluate(EMBEDDINGS, [{"dtype": "float64"}, {"dtype": "int8", "top_k": 1}], k=2)
+    assert reports[0]["rank_correlation"] == pytest.approx(1.0)
+    assert reports[0]["correlation"] == pytest.approx(1.0)
+    assert reports[0]["recall"] == 1.0
+    assert reports[1]["entries"] == len(EMBEDDINGS)
+    assert reports[1]["nbytes"] < reports[0]["nbytes"]
+
+
+def test_evaluate_ties():
+    """Test that tied neighbors do not make float32 score worse than int8."""
+    rng = np.random.default_rng(0)
+    embeddings = {}
+    for k in range(200):
+        tokens = rng.choice(40, size=6, replace=False)
+        embeddings["w%d" % k] = {"t%d" % t: float(rng.integers(1, 4)) / 3 for t in tokens}
+    configs = [{"dtype": "float64"}, {"dtype": "float32"}, {"dtype": "int8"}]
+    reports = evaluate(embeddings, configs, k=10, n_queries=100)
+    assert reports[0]["recall"] == reports[1]["recall"] == 1.0
+    assert reports[1]["correlation"] == pytest.approx(1.0)
+    assert reports[1]["recall"] >= reports[2]["recall"]
+    assert reports[1]["correlation"] >= reports[2]["correlation"]
+    # ties that float32 puts in another order still show in the rank correlation
+    assert reports[0]["rank_correlation"] == 1.0 > reports[1]["rank_correlation"]
+    assert reports[1]["rank_correlation"] >= reports[2]["rank_correlation"]
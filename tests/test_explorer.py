@@ -0,0 +1,75 @@
+"""Tests for the taxonomy explorer."""
+
+from xllm.explorer import DictionaryIndex, Explorer, get_suffix_array
+
+DICTIONARY = {
+    "data": 120,
+    "data~science": 40,
+    "metadata": 5,
+    "science": 60,
+    "bayesian": 10,
+    "bayesian~analysis": 3,
+    "analysis": 84,
+}
+
+
+def scan(dictionary, string, min_count):
+    """Reference: the linear scan the explorer used to do."""
+    found = [
+        (count, word) for word, count in dictionary.items() if string in word and count >= min_count
+    ]
+    return sorted(found, key=lambda item: (-item[0], item[1]))
+
+
+def test_find():
+    """Test substring search with a minimum count against a linear scan."""
+    index = DictionaryIndex(DICTIONARY)
+    assert index.find("data") == [(120, "data"), (40, "data~science"), (5, "metadata")]
+    assert index.find("data", 10) == [(120, "data"), (40, "data~science")]
+    assert index.find("zzz") == []
+    for string in ("a", "an", "~", "sci", "bayesian~analysis", "s"):
+        for min_count in (0, 5, 41, 1000):
+            assert index.find(string, min_count) == scan(DICTIONARY, string, min_count)
+
+
+def test_suffix_array():
+    """Test the prefix-doubling suffix array against sorted suffixes, and an empty dictionary."""
+    for words in (["banana"], ["data", "metadata"], ["aaaa", "aa", "a"], []):
+        text = "".join(word + "\x00" for word in words)
+        # suffixes compare up to the end of their word, ties broken by position
+        expected = sorted(range(len(text)), key=lambda k: (text[k:].split("\x00")[0], k))
+        suffixes = [start for start in get_suffix_array(words) if text[start] != "\x00"]
+        assert suffixes == [start for start in expected if text[start] != "\x00"]
+    assert DictionaryIndex({}).find("a") == []
+
+
+def test_at_least():
+    """Test the count range query."""
+    index = DictionaryIndex(DICTIONARY)
+    assert index.at_least(60) == [(120, "data"), (84, "analysis"), (60, "science")]
+    assert index.count_at_least(0) == len(DICTIONARY)
+
+
+def test_execute():
+    """Test the menu commands, without input()."""
+    explorer = Explorer(
+        DICTIONARY,
+        {"data": 120, "science": 60},
+        {"data": 120, "analysis": 84},
+        {"data": {"data~science": 1, "metadata": 1}},
+        {"data": {"science": 7, "analysis": 2}},
+        {("data", "science"): 7},
+    )
+    assert explorer.execute("f sci") == ["60 sci science", ""]
+    explorer.execute("df")
+    assert explorer.execute("f sci") == ["60 sci science", "40 sci data~science", ""]
+    explorer.execute("n 7")
+    assert explorer.execute("g data") == ["120 40 data data~science", ""]
+    assert explorer.execute("c data") == ["120 60 7 data science", ""]
+    explorer.execute("n 0")
+    assert explorer.execute("c data") == ["120 60 7 data science", "120 84 2 data analysis", ""]
+    assert explorer.execute("l data science") == ["7 ('data', 'science')"]
+    assert explorer.execute("g science") == ["topWord not in wordGroups", ""]
+    assert explorer.execute("a") == ["84 analysis", "120 data", ""]
+    assert explorer.execute("f") == ["Missing arguments"]
+    assert explorer.execute("") == []
@@ -0,0 +1,91 @@
+"""Import-time budget: the package and the CLI must start without heavy dependencies."""
+
+import os
+import subprocess
+import sys
+
+import xllm
+
+BUDGET_US = 100000  # 100 ms
+HEAVY_MODULES = ("numpy", "requests", "autocorrect", "pattern", "pymupdf", "fitz")
+
+
+def run(code, *options):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(xllm.__file__))
+    result = subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert result.returncode == 0, result.stderr
+    return result
+
+
+def get_loaded_modules(code):
+    """Names of all the modules loaded once code has run, nested imports included."""
+    result = run(code + "\nimport sys\nprint(' '.join(sys.modules))\n")
+    return set(result.stdout.split())
+
+
+def get_import_times(code):
+    """Top-level modules imported by code after startup, as {name: cumulative usec}."""
+    result = run(code, "-X", "importtime")
+    times = {}
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        started = started or name.strip().startswith("xllm")
+        if started and not name.startswith("  "):  # top-level import
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def check_budget(code):
+    """Check that code loads no heavy module, and its imports take less than BUDGET_US."""
+    loaded = get_loaded_modules(code)
+    for module in HEAVY_MODULES:
+        assert module not in loaded
+    times = get_import_times(code)
+    assert sum(times.values()) < BUDGET_US, times
+    return loaded
+
+
+def test_package_import_time():
+    """Test that importing the package and enterprise module is cheap."""
+    check_budget("import xllm, xllm.enterprise")
+
+
+def test_cli_help_import_time():
+    """Test that `xllm --help` starts in well under 100 ms."""
+    code = (
+        "from xllm.__main__ import main\n"
+        "try:\n"
+        "    main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    check_budget(code)
+
+
+def test_cli_query_import_time():
+    """Test that a one-shot `xllm query` loads no heavy module and starts under 100 ms."""
+    code = (
+        "from xllm.__main__ import main\n"
+        "from xllm.enterprise.backend import attach_backend_tables, load_backend_tables_from_disk\n"
+        "from xllm.enterprise.processor import process_query\n"
+    )
+    loaded = check_budget(code)  # what __main__.query imports
+    assert {"xllm.table_store", "xllm.enterprise.stemmer", "pickle", "hashlib"} <= loaded
+
+
+def test_lazy_attributes():
+    """Test that the public API is still importable by name."""
+    from xllm import XLLM, XLLMShort
+    from xllm.enterprise import process_query
+
+    assert XLLM is not None and XLLMShort is not None and process_query is not None
+    assert "XLLM" in dir(xllm)
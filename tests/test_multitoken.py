@@ -0,0 +1,47 @@
+"""Tests for the multitoken index."""
+
+from xllm.multitoken import MultitokenIndex, probe_combinations
+
+DICTIONARY = {
+    "bayesian": 10,
+    "analysis": 84,
+    "statistical": 12,
+    "bayesian~analysis": 1,
+    "analysis~statistical": 2,
+    "bayesian~analysis~statistical": 1,
+    "random~random": 1,
+}
+NGRAMS_TABLE = {
+    "analysis~bayesian": ("bayesian~analysis", "analysis~bayesian"),
+    "analysis~statistical": ("statistical~analysis",),
+}
+
+
+def test_lookup():
+    """Test words and ngram variants found for a query."""
+    index = MultitokenIndex(DICTIONARY, NGRAMS_TABLE)
+    results = index.lookup(["statistical", "bayesian", "analysis", "test"])
+    assert results == {
+        "analysis": ("analysis",),
+        "analysis~bayesian": ("bayesian~analysis", "analysis~bayesian"),
+        "analysis~bayesian~statistical": ("bayesian~analysis~statistical",),
+        "analysis~statistical": ("analysis~statistical", "statistical~analysis"),
+        "bayesian": ("bayesian",),
+        "statistical": ("statistical",),
+    }
+    assert "analysis~bayesian~statistical" not in index.lookup(
+        ["statistical", "bayesian", "analysis"], max_tokens=2
+    )
+    assert index.get_words(["random"]) == []
+    assert index.get_words(["random", "random"]) == ["random~random"]
+
+
+def test_same_as_probing():
+    """Test that the traversal finds the same keys as combinatorial probing."""
+    index = MultitokenIndex(DICTIONARY, NGRAMS_TABLE)
+    query = ["analysis", "random", "bayesian", "random", "statistical", "data"]
+    expected = probe_combinations(query, DICTIONARY, NGRAMS_TABLE, 4)
+    results = index.lookup(query, max_tokens=4)
+    assert set(results) == set(expected)
+    for key in results:
+        assert set(results[key]) == set(expected[key])
@@ -1,8 +1,70 @@
 """Tests for pdf_processor module."""
 
 import pytest
-from xllm.enterprise.pdf_processor import process_pdf
+
+from xllm.enterprise import pdf_processor
+from xllm.enterprise.pdf_processor import format_entity, iter_pdf_entities, process_pdf
+
 
 def test_pdf_processor():
     """Test pdf_processor module."""
-    assert process_pdf is not None 
\ No newline at end of file
+    assert process_pdf is not None
+
+
+def test_format_entity():
+    """Test repository line format."""
+    line = format_entity("B0X0", "Revenue", "Revenue was up.")
+    assert line == "B0X0~~{title::Revenue||description::Revenue was up.}"
+
+
+@pytest.fixture
+def sample_pdf(test_data_dir):
+    """Create a 5-page PDF with one heading on page 0 and 2 and body text on each page."""
+    pymupdf = pytest.importorskip("pymupdf")
+    doc = pymupdf.open()
+    for page_number in range(5):
+        page = doc.new_page()
+        y = 72
+        if page_number in (0, 2):
+            page.insert_text((72, y), "Heading %d" % page_number, fontsize=20)
+            y += 48
+        page.insert_text((72, y), "Body text of page %d." % page_number, fontsize=10)
+    filename = test_data_dir + "/sample.pdf"
+    doc.save(filename)
+    doc.close()
+    return filename
+
+
+def test_streaming_entities(sample_pdf):
+    """Test that headings carry over across page ranges."""
+    entities = list(iter_pdf_entities(sample_pdf, pages_per_task=1))
+    assert [entity[0] for entity in entities] == ["B0X0", "B1X0", "B2X0", "B3X0", "B4X0"]
+    assert [entity[1] for entity in entities] == ["Heading 0"] * 2 + ["Heading 2"] * 3
+    assert entities[4][2] == "Body text of page 4."
+
+
+def test_process_pdf_parallel(sample_pdf, test_data_dir):
+    """Test that the process pool produces the same repository as a single process."""
+    serial = test_data_dir + "/serial.txt"
+    parallel = test_data_dir + "/parallel.txt"
+    stats = process_pdf([sample_pdf, sample_pdf], serial, verbose=False)
+    process_pdf([sample_pdf, sample_pdf], parallel, n_workers=2, pages_per_task=2, verbose=False)
+    assert stats["pages"] == 10
+    assert stats["entities"] == 10
+    assert stats["pages_per_sec"] > 0
+    with open(serial) as f1, open(parallel) as f2:
+        assert f1.read() == f2.read()
+
+
+def test_page_count_once(sample_pdf, test_data_dir, monkeypatch):
+    """Test that process_pdf opens each document once to count pages, plus once per task."""
+    opened = []
+    open_pdf = pdf_processor.open_pdf
+
+    def counting_open_pdf(filename):
+        opened.append(filename)
+        return open_pdf(filename)
+
+    monkeypatch.setattr(pdf_processor, "open_pdf", counting_open_pdf)
+    process_pdf(sample_pdf, test_data_dir + "/repository.txt", pages_per_task=5, verbose=False)
+    assert len(opened) == 2
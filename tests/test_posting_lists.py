@@ -0,0 +1,39 @@
+"""Tests for the url_map posting lists."""
+
+from xllm import xllm_util
+from xllm.posting_lists import PostingLists, get_urls, intersect, read_url_map, union
+
+
+def test_read_url_map(create_test_file):
+    """Test that the loader matches read_table on the text format."""
+    path = create_test_file(
+        "xllm_url_map.txt",
+        "bayesian\t{'0': 7, '94': 1, '234': 1}\nanalysis\t{'94': 2, '12': 1, '0': 4}\nempty\t{}\n",
+    )
+    path = path[: -len("xllm_url_map.txt")]
+    url_map = read_url_map("xllm_url_map.txt", path=path)
+    table = xllm_util.read_table("xllm_url_map.txt", type="hash", path=path)
+    assert list(url_map) == ["bayesian", "analysis", "empty"]
+    for word in table:
+        assert url_map[word].to_hash() == table[word]
+    assert list(url_map["analysis"]) == [(0, 4), (12, 1), (94, 2)]
+    assert url_map["analysis"].get(12) == 1
+    assert 13 not in url_map["analysis"]
+    assert len(url_map["empty"]) == 0
+
+
+def test_intersect_union():
+    """Test intersection and union of posting lists, with counts summed."""
+    url_map = PostingLists.from_table(
+        {"a": {"1": 1, "3": 2, "5": 1}, "b": {"3": 1, "4": 1, "5": 3}, "c": {}}
+    )
+    assert list(intersect(url_map["a"], url_map["b"])) == [(3, 3), (5, 4)]
+    assert list(intersect(url_map["a"], url_map["c"])) == []
+    assert list(union(url_map["a"], url_map["b"])) == [(1, 1), (3, 3), (4, 1), (5, 4)]
+
+
+def test_get_urls():
+    """Test URL retrieval through arr_url."""
+    url_map = PostingLists.from_table({"a": {"0": 1, "2": 5}})
+    arr_url = ["url0", "url1", "url2"]
+    assert get_urls(url_map["a"], arr_url) == [("url2", 5), ("url0", 1)]
@@ -0,0 +1,76 @@
+"""Tests for the related-words graph."""
+
+import math
+
+from xllm.related_words import RelatedWords, build_related_words, load_related_words
+
+DICTIONARY = {"bayesian": 10, "analysis": 84, "statistical": 12, "likelihood": 5, "prior": 2}
+WORD_HASH = {
+    "bayesian": {"analysis": 3, "likelihood": 1, "prior": 1},
+    "analysis": {"bayesian": 3, "statistical": 2},
+}
+WORD2_HASH = {
+    "bayesian": {"analysis": 6, "likelihood": 4, "bayesian": 1},
+    "statistical": {"analysis": 2, "unknown": 5},
+}
+
+
+def test_build():
+    """Test that rows are merged, ranked and pruned to top_n."""
+    graph = build_related_words([WORD_HASH, WORD2_HASH], DICTIONARY, top_n=2, weighting="count")
+    assert graph.neighbors("bayesian") == [("analysis", 9.0), ("likelihood", 5.0)]
+    assert graph.neighbors("bayesian", top_n=1) == [("analysis", 9.0)]
+    assert graph.neighbors("statistical") == [("unknown", 5.0), ("analysis", 2.0)]
+    assert graph.neighbors("unknown") == []
+    assert graph.neighbors("missing") == []
+
+    graph = build_related_words([WORD_HASH, WORD2_HASH], DICTIONARY, top_n=5, weighting="pmi")
+    total = sum(DICTIONARY.values())
+    (neighbor, weight), = [item for item in graph.neighbors("bayesian") if item[0] == "prior"]
+    assert math.isclose(weight, math.log(1 * total / (10 * 2)), rel_tol=1e-6)
+    assert "unknown" not in dict(graph.neighbors("statistical"))  # not in the dictionary
+    weights = [weight for _, weight in graph.neighbors("bayesian")]
+    assert weights == sorted(weights, reverse=True)
+
+
+def test_expand():
+    """Test k-hop expansion."""
+    graph = build_related_words([WORD_HASH, WORD2_HASH], DICTIONARY, top_n=2, weighting="count")
+    assert graph.expand(["statistical"]) == [("unknown", 1, 5.0), ("analysis", 1, 2.0)]
+    assert graph.expand(["statistical"], hops=2) == [
+        ("unknown", 1, 5.0),
+        ("analysis", 1, 2.0),
+        ("bayesian", 2, 3.0),
+    ]
+    assert graph.expand(["statistical"], hops=3, top_n=1) == [("unknown", 1, 5.0)]
+    assert graph.expand(["bayesian"], hops=2, max_words=1) == [("analysis", 1, 9.0)]
+
+
+def test_cache(tmp_path):
+    """Test that the cache is saved, reused, and rebuilt when parameters change."""
+    graph = build_related_words([WORD_HASH, WORD2_HASH], DICTIONARY)
+    graph.save(str(tmp_path / "related.bin"))
+    loaded = RelatedWords.load(str(tmp_path / "related.bin"))
+    assert loaded.words == graph.words
+    for word in graph.words:
+        assert loaded.neighbors(word) == graph.neighbors(word)
+
+    for filename, table in (
+        ("xllm_dictionary.txt", DICTIONARY),
+        ("xllm_word_hash.txt", WORD_HASH),
+        ("xllm_compressed_word2_hash.txt", WORD2_HASH),
+    ):
+        with open(tmp_path / filename, "w") as OUT:
+            for key, value in table.items():
+                OUT.write(key + "\t" + str(value) + "\n")
+    path = str(tmp_path) + "/"
+    cache = str(tmp_path / "xllm_related_words.bin")
+    graph = load_related_words(path, cache=cache, top_n=1)
+    assert graph.neighbors("bayesian") == [("analysis", 9.0)]
+    assert load_related_words(path, cache=cache, top_n=1).params == graph.params
+    assert len(load_related_words(path, cache=cache, top_n=2).neighbors("bayesian")) == 2
+
+    # without the source tables, the cache built with the same parameters is used
+    for filename in ("xllm_word_hash.txt", "xllm_compressed_word2_hash.txt"):
+        (tmp_path / filename).unlink()
+    assert len(load_related_words(path, cache=cache, top_n=2).neighbors("bayesian")) == 2
@@ -0,0 +1,133 @@
+"""Tests for sharded backend tables and the query coordinator."""
+
+import pytest  # type: ignore
+
+from xllm.enterprise.backend import (
+    generate_backend_tables,
+    get_shard,
+    load_backend_tables_from_disk,
+)
+from xllm.enterprise.config import get_backend_params
+from xllm.enterprise.processor import process_query
+from xllm.enterprise.shards import (
+    QueryCoordinator,
+    merge_results,
+    partition_entities,
+    update_sharded_tables,
+)
+
+TOPICS = (
+    "data center revenue",
+    "gaming revenue",
+    "non-gaap gross margin",
+    "cash flow",
+    "income tax",
+)
+QUERIES = ("data center revenue", "gross margin", "cash flow operations", "tax", "unknown words")
+
+
+def get_lines(n_entities=40):
+    lines = []
+    for k in range(n_entities):
+        description = "%s grew %d percent in quarter %d" % (TOPICS[k % 5], k, k % 7)
+        entity = "{title::Section %d||description::%s}" % (k % 4, description)
+        lines.append("B%dX%d~~%s" % (k, k % 3, entity))
+    return lines
+
+
+def test_shard_tables(test_data_dir, write_repository):
+    """Test that shards partition the entities and global statistics add up."""
+    path = test_data_dir + "/"
+    write_repository(path, get_lines())
+    globalTables = update_sharded_tables(path, n_shards=3, verbose=False)
+    full, _ = generate_backend_tables(path=path, verbose=False)
+    assert globalTables["dictionary"] == full["dictionary"]
+    assert globalTables["n_shards"] == 3
+
+    seen = set()
+    for k in range(3):
+        shard = load_backend_tables_from_disk(path + "shard_%d/" % k)
+        assert all(get_shard(ID, 3) == k for ID in shard["ID_to_content"])
+        assert set(shard["ID_to_index"]) == set(shard["ID_to_content"])
+        seen |= set(shard["ID_to_content"])
+    assert seen == set(full["ID_to_content"])
+
+
+def test_partition_entities():
+    """Test that each shard gets its own entities and clusters, and no near-duplicate."""
+    entities = dict(line.split("~~") for line in get_lines(12))
+    duplicates = {"B0X0": ("B5X2", "B10X1")}
+    partitions = partition_entities(entities, duplicates, 3)
+    IDs = [ID for shard_entities, _ in partitions for ID in shard_entities]
+    assert sorted(IDs) == sorted(set(entities) - {"B5X2", "B10X1"})
+    for k, (shard_entities, shard_duplicates) in enumerate(partitions):
+        assert all(get_shard(ID, 3) == k for ID in shard_entities)
+        assert list(shard_entities) == [ID for ID in entities if ID in shard_entities]
+        assert shard_duplicates == (duplicates if get_shard("B0X0", 3) == k else {})
+
+
+def test_sharded_dedup(test_data_dir, write_repository):
+    """Test that near-duplicates are skipped in every shard, with one global dedup."""
+    path = test_data_dir + "/"
+    lines = get_lines(12)
+    lines += ["C%dX0~~{title::Copy||description::Non-GAAP gross margin excludes "
+              "stock-based compensation and acquisition-related costs}" % k for k in range(4)]
+    write_repository(path, lines)
+    params = dict(get_backend_params(), dedup=True)
+    update_sharded_tables(path, n_shards=3, backendParams=params, verbose=False)
+    full, _ = generate_backend_tables(params, path=path, verbose=False)
+    assert full["ID_to_duplicates"] == {"C0X0": ("C1X0", "C2X0", "C3X0")}
+
+    indexed = set()
+    for k in range(3):
+        shard = load_backend_tables_from_disk(path + "shard_%d/" % k)
+        indexed |= set(shard["ID_to_content"])
+        assert ("C0X0" in shard["ID_to_duplicates"]) == (get_shard("C0X0", 3) == k)
+    assert indexed == set(full["ID_to_content"])
+
+
+def test_coordinator(test_data_dir, write_repository):
+    """Test that scatter-gather gives the results of the unsharded tables."""
+    path = test_data_dir + "/"
+    write_repository(path, get_lines())
+    update_sharded_tables(path, n_shards=3, n_workers=2, verbose=False)
+    full, _ = generate_backend_tables(path=path, verbose=False)
+    all_results = dict(maxTokenCount=1000, ignoreList=("data",), maxResults=100)
+
+    with QueryCoordinator(path) as coordinator:
+        assert len(coordinator.workers) == 3
+        sharded = coordinator.process_queries(list(QUERIES))
+        assert coordinator.process_query("tax") == sharded[3]
+    for query, results in zip(QUERIES, sharded):
+        expected = process_query(query, full)
+        assert [score for _, score in results] == [score for _, score in expected]
+        assert set(results) <= set(process_query(query, full, frontendParams=all_results))
+    assert sharded[4] == []
+
+    with pytest.raises(ValueError):
+        QueryCoordinator(path, n_shards=4)
+
+
+def test_broken_shard(test_data_dir, write_repository):
+    """Test that a shard worker that fails or dies raises instead of hanging the coordinator."""
+    path = test_data_dir + "/"
+    write_repository(path, get_lines())
+    update_sharded_tables(path, n_shards=2, verbose=False)
+    with QueryCoordinator(path) as coordinator:
+        coordinator.workers[1].terminate()
+        with pytest.raises(RuntimeError, match="shard 1 worker exited"):
+            coordinator.process_queries(list(QUERIES))
+        assert coordinator.workers == []
+        with pytest.raises(RuntimeError):
+            coordinator.process_query("tax")
+
+    with open(path + "shard_1/backend_hash_context1.pkl", "wb") as OUT:
+        OUT.write(b"not a pickle")
+    with pytest.raises(RuntimeError, match="shard 1 worker failed"):
+        QueryCoordinator(path)
+
+
+def test_merge_results():
+    """Test the merge of per-shard top lists."""
+    shard_results = [[("B1X0", 3.0), ("B4X0", 1.0)], [("B2X0", 3.0), ("B3X0", 2.0)]]
+    assert merge_results(shard_results, 3) == [("B1X0", 3.0), ("B2X0", 3.0), ("B3X0", 2.0)]
@@ -0,0 +1,54 @@
+"""Tests for the spelling correction index."""
+
+from xllm.spelling import SpellingIndex, get_distance, get_misspellings
+
+DICTIONARY = {
+    "bayesian": 10,
+    "analysis": 84,
+    "analyst": 3,
+    "statistical": 12,
+    "statistics": 40,
+    "bayesian~analysis": 1,
+}
+
+
+def test_get_distance():
+    """Test the optimal string alignment distance."""
+    assert get_distance("analysis", "analysis", 2) == 0
+    assert get_distance("analysys", "analysis", 2) == 1
+    assert get_distance("bayesain", "bayesian", 2) == 1  # transposition
+    assert get_distance("stat", "statistics", 2) == 3
+
+
+def test_lookup():
+    """Test candidates and tie breaking by dictionary count."""
+    index = SpellingIndex(DICTIONARY)
+    assert "bayesian~analysis" not in index.words
+    assert index.lookup("analysis") == [("analysis", 0, 84)]
+    assert index.lookup("analyss")[0] == ("analysis", 1, 84)
+    assert index.lookup("statisticl", closest=True) == [
+        ("statistics", 1, 40),
+        ("statistical", 1, 12),
+    ]
+    assert index.lookup("xyzxyz") == []
+
+
+def test_correct():
+    """Test corrections, cache and unknown tokens."""
+    index = SpellingIndex(DICTIONARY)
+    assert index.correct_query("Bayesain analysys of 2023", stopwords=("of",)) == (
+        "bayesian analysis of 2023"
+    )
+    assert index.correct("bayesain") == "bayesian"
+    assert index.correct("xyzxyz") == "xyzxyz"
+    stats = index.get_stats()
+    assert stats["cache_hits"] == 1
+    assert stats["cache_misses"] == 3
+
+
+def test_misspellings():
+    """Test that generated misspellings are corrected."""
+    index = SpellingIndex(DICTIONARY)
+    for typo, word in get_misspellings(index.words, 5):
+        assert get_distance(typo, word, 2) <= 2
+        assert index.lookup(typo)
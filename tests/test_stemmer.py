@@ -0,0 +1,98 @@
+"""Tests for the stemming service."""
+
+from xllm.enterprise import stemmer as stemmer_module
+from xllm.enterprise.backend import generate_backend_tables, update_backend_tables
+from xllm.enterprise.config import get_backend_params
+from xllm.enterprise.processor import process_query
+from xllm.enterprise.stemmer import Stemmer, benchmark, strip_plural
+from xllm.table_compression import compress_file
+
+
+class CountingStemmer:
+    def __init__(self):
+        self.tokens = []
+
+    def __call__(self, token):
+        self.tokens.append(token)
+        return strip_plural(token)
+
+
+def test_stem_many():
+    """Test that each distinct token reaches the stemmer once, and the stats."""
+    counting = CountingStemmer()
+    stemmer = Stemmer(counting, cache_size=2)
+    stems = stemmer.stem_many(["revenues", "stocks", "revenues", "cash"])
+    assert stems == ["revenue", "stock", "revenue", "cash"]
+    assert stemmer.stem("stocks") == "stock"  # evicted from the LRU cache, still in the store
+    assert counting.tokens == ["revenues", "stocks", "cash"]
+    stats = stemmer.get_stats()
+    assert stats["lookups"] == 5
+    assert stats["stemmer_calls"] == 3
+    assert stats["cache_size"] == 2
+    assert stats["hit_rate"] == 2 / 5
+
+
+def test_persistent_cache(tmp_path):
+    """Test that stems are saved, reloaded and learned from hash_stem / hash_unstem."""
+    filename = str(tmp_path / "stems.txt")
+    stemmer = Stemmer(strip_plural, filename=filename)
+    stemmer.merge_tables({"companies": "company"}, {"company": ("companies", "company")})
+    stemmer.stem_many(["revenues", "companies"])
+    stemmer.save()
+
+    compress_file(filename, remove=True)
+    counting = CountingStemmer()
+    stemmer = Stemmer(counting, filename=filename)
+    stems = stemmer.stem_many(["revenues", "companies", "company"])
+    assert stems == ["revenue", "company", "company"]
+    assert counting.tokens == []
+
+
+def test_write_tables():
+    """Test that learned stems are written back into hash_stem / hash_unstem once."""
+    stemmer = Stemmer(strip_plural)
+    stemmer.stem_many(["revenues", "cash", "companies"])
+    hash_stem = {"companies": "company"}
+    hash_unstem = {"company": ("companies",)}
+    assert stemmer.write_tables(hash_stem, hash_unstem) == 2
+    assert hash_stem == {"companies": "company", "revenues": "revenue"}
+    assert hash_unstem == {"company": ("companies",), "revenue": ("revenues",), "cash": ("cash",)}
+    assert stemmer.write_tables(hash_stem, hash_unstem) == 0
+
+
+def test_use_stem(test_data_dir, monkeypatch):
+    """Test stemmed backend tables, the stem cache file, and stemmed queries."""
+    monkeypatch.setattr(stemmer_module, "get_stem", strip_plural)
+    path = test_data_dir + "/"
+    with open(path + "repository.txt", "w", encoding="utf-8") as f:
+        f.write("B0X0~~{title::Revenues||description::Data Center revenues were records}\n")
+        f.write("B1X0~~{title::Cash||description::Cash flows from operations}\n")
+    params = dict(get_backend_params(), use_stem=True)
+    backendTables = update_backend_tables(path, backendParams=params, verbose=False)
+    assert backendTables["hash_stem"]["revenues"] == "revenue"
+    assert "revenues" in backendTables["hash_unstem"]["revenue"]
+    with open(path + "backend_stem_cache.txt", encoding="utf-8") as f:
+        assert "revenues\trevenue\n" in f.read()
+
+    counting = CountingStemmer()
+    full, _ = generate_backend_tables(params, path=path, verbose=False, stemmer=Stemmer(counting))
+    assert full["dictionary"] == backendTables["dictionary"]
+    assert counting.tokens.count("revenues") == 1
+
+    results = process_query("cash flow", backendTables, params, stemmer=Stemmer(strip_plural))
+    assert [entity_ID for entity_ID, _ in results] == ["B1X0"]
+
+    with open(path + "backend_stem_cache.txt", "a", encoding="utf-8") as f:
+        f.write("profits\tprofit\n")
+    backendTables = update_backend_tables(path, backendParams=params, verbose=False)
+    assert backendTables["hash_stem"]["profits"] == "profit"
+    counting = CountingStemmer()
+    process_query("cash profits", backendTables, params, stemmer=Stemmer(counting))
+    assert counting.tokens == []
+
+
+def test_benchmark():
+    """Test that the benchmark gives the stemmer's results."""
+    report = benchmark(["revenues", "stocks", "revenues"] * 10, strip_plural, run_length=4)
+    assert report["distinct"] == 2
+    assert report["stats"]["stemmer_calls"] == 2
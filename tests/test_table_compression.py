@@ -0,0 +1,140 @@
+"""Tests for compressed table storage."""
+
+import gzip
+import io
+import os
+import types
+
+import pytest  # type: ignore
+import requests
+
+from xllm import xllm_util as llm
+from xllm.enterprise.backend import (
+    generate_backend_tables,
+    load_backend_tables_from_disk,
+    read_backend_params,
+    save_backend_tables,
+)
+from xllm.enterprise.config import get_backend_params
+from xllm.related_words import load_related_words
+from xllm.table_compression import benchmark, compress_directory, compress_file, get_codecs
+
+REPOSITORY = [
+    "E1X0~~{title::Data Center Revenue||description::Revenue from data center products}",
+    "E2X0~~{title::Gross Margin||description::Non-GAAP gross margin was 75 percent}",
+]
+
+
+def write_table(path, filename, lines):
+    with open(os.path.join(path, filename), "w", encoding="utf-8") as OUT:
+        for line in lines:
+            OUT.write(line + "\n")
+
+
+@pytest.mark.parametrize("codec", get_codecs())
+def test_get_data_streams_compressed(test_data_dir, codec):
+    """Test that get_data() is a generator and reads a compressed copy like the text file."""
+    path = test_data_dir + "/"
+    write_table(path, "xllm_dictionary.txt", ["data\t12  ", "revenue\t7", "data~center\t3"])
+    write_table(path, "stopwords.txt", ["('of', 'the', 'in')"])
+    expected = list(llm.get_data("xllm_dictionary.txt", path))
+    assert isinstance(llm.get_data("xllm_dictionary.txt", path), types.GeneratorType)
+
+    compress_directory(path, codec, remove=True, verbose=False)
+    assert not os.path.exists(path + "xllm_dictionary.txt")
+    suffix = ".txt.gz" if codec == "gzip" else ".txt.zst"
+    assert llm.get_table_path("xllm_dictionary.txt", path).endswith(suffix)
+    assert list(llm.get_data("xllm_dictionary.txt", path)) == expected
+    dictionary = llm.read_dictionary("xllm_dictionary.txt", path)
+    assert dictionary == {"data": 12, "revenue": 7, "data~center": 3}
+    assert llm.read_stopwords("stopwords.txt", path) == ("of", "the", "in")
+
+
+def test_text_file_wins(test_data_dir):
+    """Test that a table rewritten as text is not shadowed by an older compressed copy."""
+    path = test_data_dir + "/"
+    write_table(path, "xllm_arr_url.txt", ["0\thttps://old"])
+    compress_file(path + "xllm_arr_url.txt")
+    write_table(path, "xllm_arr_url.txt", ["0\thttps://new"])
+    assert llm.read_arr_url("xllm_arr_url.txt", path) == ["https://new"]
+    os.remove(path + "xllm_arr_url.txt")
+    assert llm.read_arr_url("xllm_arr_url.txt", path) == ["https://old"]
+    assert llm.get_table_path("xllm_missing.txt", path) is None
+
+
+class Response:
+    """Streamed response of requests.get, served from bytes."""
+
+    def __init__(self, content=None):
+        self.status_code = 404 if content is None else 200
+        self.raw = io.BytesIO(content or b"")
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def test_remote_get_data(monkeypatch):
+    """Test that a remote table, or its compressed copy, is streamed line by line."""
+    files = {
+        "http://tables/xllm_arr_url.txt": b"0\thttps://a  \r\n1\thttps://b\r\n",
+        "http://tables/stopwords.txt.gz": gzip.compress(b"('of', 'the')\n"),
+    }
+    monkeypatch.setattr(requests, "get", lambda url, stream=False: Response(files.get(url)))
+    lines = llm.get_data("xllm_arr_url.txt", "http://tables/")
+    assert isinstance(lines, types.GeneratorType)
+    assert list(lines) == ["0\thttps://a", "1\thttps://b"]
+    assert llm.read_stopwords("stopwords.txt", "http://tables/") == ("of", "the")
+
+
+def test_compressed_related_words(test_data_dir):
+    """Test that the related-words graph is built from a compressed table directory."""
+    path = test_data_dir + "/"
+    write_table(path, "xllm_dictionary.txt", ["bayesian\t10", "analysis\t84", "prior\t2"])
+    write_table(path, "xllm_word_hash.txt", ["bayesian\t{'analysis': 3, 'prior': 1}"])
+    write_table(path, "xllm_compressed_word2_hash.txt", ["analysis\t{'bayesian': 6}"])
+    compress_directory(path, remove=True, verbose=False)
+    assert not any(filename.endswith(".txt") for filename in os.listdir(path))
+
+    cache = path + "xllm_related_words.bin"
+    graph = load_related_words(path, cache=cache)
+    assert graph.neighbors("bayesian") == [("analysis", 3.0), ("prior", 1.0)]
+    assert graph.neighbors("analysis") == [("bayesian", 6.0)]
+    assert load_related_words(path, cache=cache).params == graph.params
+
+
+def test_benchmark_compressed(test_data_dir):
+    """Test that the benchmark measures tables stored only compressed."""
+    path = test_data_dir + "/"
+    write_table(path, "xllm_dictionary.txt", ["data\t12", "revenue\t7"])
+    compress_directory(path, remove=True, verbose=False)
+    report = benchmark(path, ["gzip"], repeat=1)
+    assert list(report) == ["dictionary"]
+    assert report["dictionary"]["text"][0] == len("data\t12\nrevenue\t7\n")
+    assert os.listdir(path) == ["xllm_dictionary.txt.gz"]
+
+
+def test_compressed_backend_tables(test_data_dir, write_repository):
+    """Test that the enterprise loaders read a compressed table directory."""
+    path = test_data_dir + "/"
+    write_repository(path, REPOSITORY)
+    backendParams = dict(get_backend_params(), use_stem=False)
+    filenames = ["repository.txt"]
+    backendTables, _ = generate_backend_tables(backendParams, filenames, path, verbose=False)
+    assert list(backendTables["ID_to_content"]) == ["E1X0", "E2X0"]
+    assert backendTables["dictionary"]["gross~margin"] == 2
+    assert backendTables["hash_context1"]["revenue"] == {"E1X0": 2}
+    save_backend_tables(backendTables, path, backendParams)
+    expected = load_backend_tables_from_disk(path)
+
+    sizes = compress_directory(path, "gzip", remove=True, verbose=False)
+    assert "repository.txt" in sizes
+    assert load_backend_tables_from_disk(path) == expected
+    assert read_backend_params(path) == backendParams
+    tables, _ = generate_backend_tables(backendParams, filenames, path, verbose=False)
+    assert tables == backendTables
@@ -0,0 +1,74 @@
+"""Tests for the shared table store."""
+
+from multiprocessing import Pool
+
+import pytest
+
+from xllm.table_store import (
+    TableStore,
+    attach_tables,
+    compile_tables,
+    publish_shared_tables,
+    publish_tables,
+)
+
+TABLES = {
+    "dictionary": {"bayesian": 10, "analysis": 84, "bayesian~analysis": 1},
+    "embeddings": {"bayesian": {"analysis": 21.8, "range": 5.9}, "analysis": {}},
+    "url_map": {"bayesian": {"0": 7, "94": 1}},
+    "ngrams_table": {"analysis~bayesian": ("bayesian~analysis", "analysis~bayesian")},
+    "hash_stem": {"théorème": "theorem"},
+    "arr_url": ["https://mathworld.wolfram.com/BayesianAnalysis.html", "u1"],
+}
+
+
+def get_tables(store):
+    tables = {}
+    for name in store:
+        table = store[name]
+        tables[name] = list(table) if name == "arr_url" else dict(table.items())
+    return tables
+
+
+def test_round_trip(test_data_dir):
+    """Test that attached tables are equal to the published ones."""
+    filename = test_data_dir + "/tables.bin"
+    publish_tables(TABLES, filename)
+    store = attach_tables(filename)
+    assert get_tables(store) == TABLES
+    assert "bayesian~analysis" in store["dictionary"]
+    assert "missing" not in store["dictionary"]
+    assert store["ngrams_table"].get("missing") is None
+    assert store["arr_url"][1] == "u1"
+    store.close()
+
+
+def test_read_only():
+    """Test that attached tables cannot be modified."""
+    store = TableStore(compile_tables(TABLES))
+    with pytest.raises(TypeError):
+        store["dictionary"]["bayesian"] = 3
+
+
+def test_unsupported_table():
+    """Test that tables with non-string keys are rejected."""
+    with pytest.raises(TypeError):
+        compile_tables({"hash_pairs": {("a", "b"): 1}})
+
+
+def read_count(name):
+    store = attach_tables(name=name)
+    count = store["dictionary"]["analysis"]
+    store.close()
+    return count
+
+
+def test_shared_memory():
+    """Test that worker processes attach to tables published in shared memory."""
+    shm = publish_shared_tables(TABLES)
+    try:
+        with Pool(2) as pool:
+            assert pool.map(read_count, [shm.name] * 4) == [84] * 4
+    finally:
+        shm.close()
+        shm.unlink()
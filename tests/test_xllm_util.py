@@ -38,3 +38,11 @@ def test_reject():
     assert xllm_util.reject("1test", stopwords) is True
     assert xllm_util.reject("of", stopwords) is True
     assert xllm_util.reject("example", stopwords) is False
+
+
+def test_get_data(tmp_path):
+    """Test that get_data streams the lines of a table, trailing whitespace removed."""
+    (tmp_path / "table.txt").write_text("a\t1 \nb\t2\n", encoding="utf-8")
+    data = xllm_util.get_data("table.txt", str(tmp_path) + "/")
+    assert next(data) == "a\t1"
+    assert list(data) == ["b\t2"]